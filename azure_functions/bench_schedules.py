@@ -0,0 +1,323 @@
+"""
+Micro-benchmarks for the schedule generator.
+Run: python azure_functions/bench_schedules.py [--json sections.json]
+
+Sections are parsed from the Spring 2026 faculty list at the repo root
+(or loaded from a JSON dump of `course_parser.parse_course_pdf` output,
+which skips the slow PDF parse on repeated runs).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ewumate_api as api
+from ewumate_api import course_parser, schedule_solver
+
+FACULTY_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Faculty List Spring 2026.pdf")
+
+
+def load_sections(json_path=None):
+    if json_path and os.path.exists(json_path):
+        with open(json_path) as f:
+            return json.load(f)
+    sections = course_parser.parse_course_pdf(FACULTY_PDF, "Spring2026")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(sections, f)
+    return sections
+
+
+# ─── Baseline: the pre-bitmask conflict check ──────────────────────────
+
+def _legacy_parse_time_to_minutes(time_str):
+    if not time_str:
+        return None
+    try:
+        t = time_str.strip().upper()
+        if "AM" in t or "PM" in t:
+            dt = datetime.strptime(t, "%I:%M %p")
+        else:
+            dt = datetime.strptime(t, "%H:%M")
+        return dt.hour * 60 + dt.minute
+    except ValueError:
+        return None
+
+
+def _legacy_sections_conflict(sec1, sec2):
+    for s1 in sec1.get("sessions", []):
+        for s2 in sec2.get("sessions", []):
+            d1 = set(s1.get("day", "").replace(" ", "").upper())
+            d2 = set(s2.get("day", "").replace(" ", "").upper())
+            if d1.isdisjoint(d2):
+                continue
+            times = (
+                _legacy_parse_time_to_minutes(s1.get("startTime") or s1.get("start_time")),
+                _legacy_parse_time_to_minutes(s1.get("endTime") or s1.get("end_time")),
+                _legacy_parse_time_to_minutes(s2.get("startTime") or s2.get("start_time")),
+                _legacy_parse_time_to_minutes(s2.get("endTime") or s2.get("end_time")),
+            )
+            if None in times:
+                continue
+            if max(times[0], times[2]) < min(times[1], times[3]):
+                return True
+    return False
+
+
+# ─── Benchmarks ─────────────────────────────────────────────────────────
+
+def bench_conflicts(sections, pairs=20000):
+    rng = random.Random(42)
+    sample = [(rng.choice(sections), rng.choice(sections)) for _ in range(pairs)]
+
+    t0 = time.perf_counter()
+    legacy = [_legacy_sections_conflict(a, b) for a, b in sample]
+    legacy_rate = pairs / (time.perf_counter() - t0)
+
+    schedule_solver.parse_time_to_minutes.cache_clear()
+    bare = [
+        {**s, "sessions": [
+            {k: v for k, v in sess.items() if k not in ("startMinutes", "endMinutes", "dayMask")}
+            for sess in s.get("sessions") or []
+        ]}
+        for s in sections
+    ]
+    t0 = time.perf_counter()
+    masks = {id(s): schedule_solver.section_mask(b) for s, b in zip(sections, bare)}
+    compile_ms = (time.perf_counter() - t0) * 1000
+
+    # Stored per-session fields as written by course_parser (startMinutes/endMinutes/dayMask)
+    stored = [course_parser.add_timing_fields(json.loads(json.dumps(s))) for s in bare]
+    t0 = time.perf_counter()
+    for s in stored:
+        schedule_solver.section_mask(s)
+    stored_ms = (time.perf_counter() - t0) * 1000
+
+    mask_pairs = [(masks[id(a)], masks[id(b)]) for a, b in sample]
+    t0 = time.perf_counter()
+    fast = [(a & b) != 0 for a, b in mask_pairs]
+    fast_rate = pairs / (time.perf_counter() - t0)
+
+    mismatches = sum(1 for x, y in zip(legacy, fast) if x != y)
+    print("=== Conflict checks ===")
+    print(f"  sections compiled: {len(sections)} in {compile_ms:.1f} ms from strings, "
+          f"{stored_ms:.1f} ms from stored session timing")
+    print(f"  legacy  : {legacy_rate:>14,.0f} checks/s")
+    print(f"  bitmask : {fast_rate:>14,.0f} checks/s  ({fast_rate / legacy_rate:.0f}x)")
+    print(f"  mismatches vs legacy: {mismatches}")
+
+
+def sample_requests(sections, count=20, size=5, min_sections=8, seed=7):
+    """Random `size`-course requests drawn from courses with many sections."""
+    by_code = {}
+    for sec in sections:
+        by_code.setdefault(sec["code"], []).append(sec)
+    codes = sorted(c for c, v in by_code.items() if len(v) >= min_sections)
+    rng = random.Random(seed)
+    return [{c: by_code[c] for c in rng.sample(codes, size)} for _ in range(count)]
+
+
+def unsatisfiable_request(sections, size=5):
+    """
+    A `size`-course request with no valid schedule that plain backtracking only
+    discovers at the last level: the extra course's 40 sections each clash
+    with every section of the smallest requested course.
+    """
+    sections_map = dict(sample_requests(sections, count=1, size=size - 1, min_sections=15)[0])
+    smallest = min(sections_map.values(), key=len)
+    blocker_sessions = [sess for sec in smallest for sess in sec["sessions"]]
+    sections_map["BLOCKER"] = [
+        {"doc_id": f"course_BLOCKER_{i}", "code": "BLOCKER", "section": str(i),
+         "capacity": "0/40", "sessions": blocker_sessions}
+        for i in range(1, 41)
+    ]
+    return sections_map
+
+
+def bench_unsatisfiable(sections, modes=("backtrack", "bitset", "forward", "classes")):
+    sections_map = unsatisfiable_request(sections)
+    sizes = ", ".join(f"{c}:{len(v)}" for c, v in sections_map.items())
+    print(f"=== Unsatisfiable request ({sizes}) ===")
+    for mode in modes:
+        t0 = time.perf_counter()
+        found = len(api._generate_schedules(sections_map, {}, limit=80, mode=mode))
+        print(f"  {mode:<10}: {(time.perf_counter() - t0) * 1000:8.2f} ms  ({found} schedules)")
+
+
+def bench_collapse(sections, codes=("ENG7101", "ENG7102", "ECO7101", "CSE101")):
+    """Search-tree size over sections vs over timetable-equivalence classes (exhaustive, no materialization)."""
+    print("=== Timetable-equivalence classes ===")
+    groups = [[schedule_solver.section_mask(s) for s in sections if s["code"] == c] for c in codes]
+    class_groups, _ = schedule_solver.collapse_equivalent(groups)
+    for code, group, classes in zip(codes, groups, class_groups):
+        print(f"  {code:<8}: {len(group):3d} sections -> {len(classes):3d} classes")
+    for label, search_groups in (("sections", groups), ("classes", class_groups)):
+        t0 = time.perf_counter()
+        course_bits, compat = schedule_solver.build_compatibility(search_groups)
+        leaves = schedule_solver.search_forward_checking(course_bits, compat, lambda indices: 1, 10 ** 9)
+        print(f"  {label:<10}: {(time.perf_counter() - t0) * 1000:8.2f} ms  ({leaves} leaves)")
+
+
+def bench_generate(sections, modes=("backtrack", "bitset", "forward", "classes"), limit=80, size=5):
+    requests = sample_requests(sections, size=size)
+    print(f"=== Generation: {len(requests)} x {size}-course requests, limit={limit} ===")
+    for mode in modes:
+        found = 0
+        t0 = time.perf_counter()
+        for sections_map in requests:
+            found += len(api._generate_schedules(sections_map, {}, limit=limit, mode=mode))
+        elapsed = time.perf_counter() - t0
+        print(f"  {mode:<10}: {elapsed * 1000 / len(requests):8.2f} ms/request  ({found} schedules)")
+
+
+def bench_parallel(sections, worker_counts=(1, 2, 4), limit=20000, size=5):
+    """Sequential class search vs the process-pool split, 5-course requests of 20+ sections each."""
+    requests = sample_requests(sections, count=5, size=size, min_sections=20)
+    print(f"=== Parallel: {len(requests)} x {size}-course requests (20+ sections each), "
+          f"limit={limit}, cpus={os.cpu_count()} ===")
+    runs = [("classes", {})] + [(f"parallel x{w}", {"workers": w}) for w in worker_counts]
+    baseline = None
+    for label, kwargs in runs:
+        mode = "parallel" if kwargs else "classes"
+        if kwargs:
+            # warm the pool so process start-up is not billed to the first request
+            api._generate_schedules(requests[0], {}, limit=1, mode=mode, **kwargs)
+        t0 = time.perf_counter()
+        for sections_map in requests:
+            api._generate_schedules(sections_map, {}, limit=limit, mode=mode, **kwargs)
+        elapsed = (time.perf_counter() - t0) * 1000 / len(requests)
+        baseline = baseline or elapsed
+        print(f"  {label:<12}: {elapsed:9.2f} ms/request  ({baseline / elapsed:.2f}x)")
+
+
+def bench_ranked(sections, k=80, size=5):
+    """Top-k by preference score: branch-and-bound vs enumerate-everything-then-sort."""
+    requests = sample_requests(sections, count=5, size=size)
+    preferences = {"weights": {"campus_days": 1, "gaps": 0.5, "early_start": 1}}
+    prefs = schedule_solver.compile_preferences(preferences)
+    print(f"=== Ranked top-{k}: {len(requests)} x {size}-course requests ===")
+
+    t0 = time.perf_counter()
+    for sections_map in requests:
+        every = api._generate_schedules(sections_map, {}, limit=10 ** 9, mode="forward")
+        scored = []
+        for sched in every:
+            occupied = 0
+            for sec in sched:
+                occupied |= schedule_solver.section_mask(sec)
+            penalty = sum(schedule_solver.section_penalty(schedule_solver.SectionModel(sec), prefs) for sec in sched)
+            scored.append(schedule_solver.schedule_cost(occupied, penalty, prefs))
+        scored.sort()
+    print(f"  enumerate+sort : {(time.perf_counter() - t0) * 1000 / len(requests):9.2f} ms/request")
+
+    t0 = time.perf_counter()
+    for sections_map in requests:
+        api._generate_schedules(sections_map, {}, limit=k, mode="ranked", preferences=preferences)
+    print(f"  branch-and-bound: {(time.perf_counter() - t0) * 1000 / len(requests):8.2f} ms/request")
+
+
+def bench_count(sections, size=5):
+    """Exact schedule counts: counting search vs materializing every schedule."""
+    requests = sample_requests(sections, size=size)
+    print(f"=== Count-only: {len(requests)} x {size}-course requests ===")
+    for label, run in (
+        ("enumerate", lambda m: len(api._generate_schedules(m, {}, limit=10 ** 9, mode="classes"))),
+        ("count", lambda m: api._count_schedules(m, {})),
+    ):
+        total = 0
+        t0 = time.perf_counter()
+        for sections_map in requests:
+            total += run(sections_map)
+        print(f"  {label:<10}: {(time.perf_counter() - t0) * 1000 / len(requests):9.2f} ms/request  ({total} schedules)")
+
+
+def bench_search_profile(sections, size=5, limit=100000):
+    """Peak traced memory and search nodes per second of each mode on 5-course requests."""
+    requests = sample_requests(sections, size=size)
+    print(f"=== Search profile: {len(requests)} x {size}-course requests, limit={limit} ===")
+    runs = (("backtrack", None), ("forward", None), ("classes", None), ("scalable", None),
+            ("ranked", {"weights": {"campus_days": 1, "gaps": 0.5, "early_start": 1}}))
+    for mode, preferences in runs:
+        nodes = peak = 0
+        elapsed = 0.0
+        for sections_map in requests:
+            budget = schedule_solver.SearchBudget()
+            t0 = time.perf_counter()
+            api._generate_schedules(sections_map, {}, limit=80 if preferences else limit, mode=mode,
+                                    preferences=preferences, budget=budget)
+            elapsed += time.perf_counter() - t0
+            nodes += budget.nodes
+            # Memory on a second run: tracing slows the search down
+            tracemalloc.start()
+            api._generate_schedules(sections_map, {}, limit=80 if preferences else limit, mode=mode,
+                                    preferences=preferences)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        print(f"  {mode:<10}: {nodes / elapsed:12,.0f} nodes/s  {elapsed * 1000 / len(requests):8.2f} ms/request  "
+              f"peak {peak / 1024:8.0f} KiB")
+
+
+LARGE_REQUEST_TARGET_MS = 500
+
+
+def bench_large(sections, sizes=(6, 7, 8), count=50, limit=80):
+    """
+    First page of 6-8 course requests: plain backtracking vs the scalable
+    mode, both under the large-request budget, plus an unsatisfiable
+    8-course request. The scalable mode must stay within
+    LARGE_REQUEST_TARGET_MS at p95 and never hit its budget.
+    """
+    print(f"=== Large requests: {count} x {sizes} courses, limit={limit}, "
+          f"target p95 < {LARGE_REQUEST_TARGET_MS} ms ===")
+    cases = [(f"{size} courses", sample_requests(sections, count=count, size=size, min_sections=8, seed=size))
+             for size in sizes]
+    cases.append(("8 unsat", [unsatisfiable_request(sections, size=8)]))
+    met = True
+    for label, requests in cases:
+        for mode in ("backtrack", "scalable"):
+            times = []
+            stopped = 0
+            for sections_map in requests:
+                state = {}
+                budget = schedule_solver.SearchBudget(seconds=api.SCHEDULE_LARGE_TIME_BUDGET)
+                t0 = time.perf_counter()
+                api._generate_schedules(sections_map, {}, limit=limit, mode=mode, state=state, budget=budget)
+                times.append((time.perf_counter() - t0) * 1000)
+                stopped += state["stopped"] is not None
+            times.sort()
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            print(f"  {label:<10} {mode:<10}: p50 {times[len(times) // 2]:8.2f} ms  p95 {p95:8.2f} ms  "
+                  f"max {times[-1]:8.2f} ms  budget hit {stopped}/{len(requests)}")
+            if mode == "scalable":
+                met = met and p95 < LARGE_REQUEST_TARGET_MS and not stopped
+    print(f"  latency target {'met' if met else 'MISSED'}")
+    return met
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json", help="cache parsed sections in this JSON file")
+    parser.add_argument("--open-seats", action="store_true",
+                        help="treat every section as having free seats (pre-advising load)")
+    args = parser.parse_args()
+
+    all_sections = load_sections(args.json)
+    if args.open_seats:
+        for sec in all_sections:
+            sec["capacity"] = "0/40"
+    bench_conflicts(all_sections)
+    bench_generate(all_sections)
+    bench_generate(all_sections, limit=100000)
+    bench_unsatisfiable(all_sections)
+    bench_collapse(all_sections)
+    bench_ranked(all_sections)
+    bench_count(all_sections)
+    bench_search_profile(all_sections)
+    bench_large(all_sections)
+    bench_parallel(all_sections)
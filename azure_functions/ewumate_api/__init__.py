@@ -3,15 +3,27 @@ EWUmate Azure Functions — Supabase Backend
 ==========================================
 Main endpoints:
   POST /api/generate_schedules    - Schedule generation (backtracking)
+  POST /api/next_schedules_page   - Next page of an existing generation
+  POST /api/count_schedules       - Number of valid schedules (no writes)
+  POST /api/cancel_generation     - Stop a running schedule generation
+  POST /api/swap_course           - Sections of one course that fit a saved schedule
+  POST /api/generate_batch        - Precompute schedules for many students at once
   POST /api/parse_calendar        - Manual PDF calendar parser
 """
 
+import hashlib
 import json
 import logging
 import os
 import io
+import itertools
+import queue
 import re
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import as_completed
 from datetime import datetime as _dt
 import azure.functions as func
 from supabase import create_client, Client
@@ -25,10 +37,15 @@ from . import calendar_parser
 from . import course_parser
 from . import exam_parser
 from . import advising_parser
+from . import schedule_solver
 
 # ─── Supabase Config ───────────────────────────────────────────────
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "https://jwygjihrbwxhehijldiz.supabase.co")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
+# >1 solves schedule subtrees in a process pool of this size (see _generate_schedules mode="parallel")
+SCHEDULE_SOLVER_WORKERS = int(os.environ.get("SCHEDULE_SOLVER_WORKERS", "0") or 0)
+# Processes for faculty list page extraction (course_parser); <= 1 parses sequentially
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0") or 0)
 
 def _get_supabase() -> Client:
     return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
@@ -48,6 +65,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
     handlers = {
         "generate_schedules": handle_generate_schedules,
+        "next_schedules_page": handle_next_schedules_page,
+        "count_schedules": handle_count_schedules,
+        "cancel_generation": handle_cancel_generation,
+        "swap_course": handle_swap_course,
+        "generate_batch": handle_generate_batch,
         "parse_calendar": handle_parse_calendar,
         "parse_faculty": handle_parse_faculty,
         "parse_exam": handle_parse_exam,
@@ -79,51 +101,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 # ═══════════════════════════════════════════════════════════════════
 #  SCHEDULE GENERATION  (Backtracking)
 # ═══════════════════════════════════════════════════════════════════
-from datetime import datetime as _dt
-
-def _parse_time_to_minutes(time_str):
-    if not time_str:
-        return None
-    try:
-        t = time_str.strip().upper()
-        if "AM" in t or "PM" in t:
-            dt = _dt.strptime(t, "%I:%M %p")
-        else:
-            dt = _dt.strptime(t, "%H:%M")
-        return dt.hour * 60 + dt.minute
-    except ValueError:
-        return None
-
-
-def _times_conflict(s1, e1, s2, e2):
-    if None in (s1, e1, s2, e2):
-        return False
-    return max(s1, s2) < min(e1, e2)
-
-
-def _is_day_conflict(d1, d2):
-    s1 = set(d1.replace(" ", "").upper())
-    s2 = set(d2.replace(" ", "").upper())
-    return not s1.isdisjoint(s2)
-
-
-def _sections_conflict(sec1, sec2):
-    for s1 in sec1.get("sessions", []):
-        for s2 in sec2.get("sessions", []):
-            if not _is_day_conflict(s1.get("day", ""), s2.get("day", "")):
-                continue
-            if _times_conflict(
-                _parse_time_to_minutes(s1.get("startTime") or s1.get("start_time")),
-                _parse_time_to_minutes(s1.get("endTime") or s1.get("end_time")),
-                _parse_time_to_minutes(s2.get("startTime") or s2.get("start_time")),
-                _parse_time_to_minutes(s2.get("endTime") or s2.get("end_time")),
-            ):
-                return True
-    return False
-
-
-def _is_section_valid(section, filters):
-    """Check capacity and user filters."""
+def _has_open_seats(section):
+    """Capacity check: "enrolled/total" with at least one free seat."""
     cap = str(section.get("capacity", "0/0"))
     try:
         if "/" not in cap:
@@ -133,38 +112,224 @@ def _is_section_valid(section, filters):
             return False
     except Exception:
         return False
-
-    if not filters:
-        return True
-
-    excluded_days = filters.get("exclude_days", [])
-    if excluded_days:
-        day_chars = {
-            "sunday": "S", "monday": "M", "tuesday": "T",
-            "wednesday": "W", "thursday": "R", "friday": "F", "saturday": "A",
-        }
-        for sess in section.get("sessions", []):
-            day_str = sess.get("day", "").upper()
-            for ex in excluded_days:
-                c = day_chars.get(ex.lower())
-                if c and c in day_str:
-                    return False
     return True
 
 
-def _generate_schedules(sections_map, filters, on_new_schedule=None, limit=80):
-    """Backtracking schedule generator with incremental callback."""
+def _compile_sections(sections_map, compiled):
+    """
+    Code -> [SectionModel] of the sections with open seats that pass the
+    compiled filters (schedule_solver.compile_filters); None if a course
+    has none.
+    """
     valid = {}
     for code, secs in sections_map.items():
-        v = [s for s in secs if _is_section_valid(s, filters)]
-        if not v:
-            return []  # unsatisfiable
-        valid[code] = v
+        # Compile each section once into its weekly occupancy bitmask and day/faculty sets
+        models = [schedule_solver.SectionModel(s) for s in secs if _has_open_seats(s)]
+        keep = schedule_solver.filter_sections(models, compiled)
+        if not keep:
+            return None
+        valid[code] = [models[i] for i in keep]
+    return valid
+
+
+def _day_limit(day_masks, compiled):
+    """DayLimit over flat search indices with these 7-bit day masks, None without max_campus_days."""
+    if compiled["max_days"] is None:
+        return None
+    return schedule_solver.DayLimit(day_masks, compiled["max_days"])
+
+
+def _compile_classes(valid, sorted_codes):
+    """
+    (pools, masks, days, course_bits, compat) over timetable-equivalence
+    classes; pools[i] are the section rows behind class i, masks[i] and
+    days[i] their shared occupancy and day masks.
+    """
+    class_groups, members = schedule_solver.collapse_equivalent(
+        [[m.mask for m in valid[code]] for code in sorted_codes]
+    )
+    # Concrete sections behind each flat class index
+    pools, days = [], []
+    for code, course_members in zip(sorted_codes, members):
+        for positions in course_members:
+            pools.append([valid[code][pos].row for pos in positions])
+            days.append(valid[code][positions[0]].days)
+    course_bits, compat = schedule_solver.build_compatibility(class_groups)
+    return pools, [m for group in class_groups for m in group], days, course_bits, compat
+
+
+def _count_schedules(sections_map, filters, cap=None):
+    """Exact number of valid schedules (at least `cap` once reached), counted over equivalence classes."""
+    compiled = schedule_solver.compile_filters(filters)
+    valid = _compile_sections(sections_map, compiled)
+    if valid is None:
+        return 0
+    sorted_codes = sorted(valid.keys(), key=lambda k: len(valid[k]))
+    pools, _, days, course_bits, compat = _compile_classes(valid, sorted_codes)
+    course_bits = schedule_solver.prune_domains(course_bits, compat)
+    return schedule_solver.count_forward_checking(
+        course_bits, compat, [len(p) for p in pools], cap, _day_limit(days, compiled),
+    )
+
+
+# Search nodes the resumable modes may spend past a full page to learn whether
+# more schedules exist; running out reports "hasMore" instead of a partial page
+HAS_MORE_PEEK_NODES = 20000
+
+
+def _generate_schedules(sections_map, filters, on_new_schedule=None, limit=80, mode="backtrack", preferences=None,
+                        workers=2, cursor=None, state=None, budget=None):
+    """
+    Backtracking schedule generator with incremental callback.
+
+    mode="backtrack" checks each candidate against the running occupancy mask;
+    mode="bitset" precomputes an N x N compatibility bitset over all valid
+    sections and narrows candidates by intersecting bitsets as it descends.
+    Both visit schedules in the same order.
+    mode="forward" adds forward checking and smallest-domain-first course
+    ordering on top of the bitsets; dead ends are detected one level after
+    the placement that causes them, at the cost of a different visit order.
+    mode="classes" runs the forward-checking search over timetable-equivalence
+    classes (sections with identical sessions) and expands each class
+    combination into concrete schedules only when emitting them.
+    mode="parallel" is "classes" with the subtrees below the first course's
+    sections solved in a pool of `workers` processes; same output order.
+    mode="scalable" is "classes" over arc-consistent domains
+    (schedule_solver.prune_domains), for 6-8 course requests; run it with
+    a budget.
+    All three enumerate lazily and are resumable: state["cursor"] receives a
+    JSON-serializable position after the last schedule returned (None when
+    the search is exhausted), and passing it back as `cursor` continues
+    with the next schedule. After a full page, at most HAS_MORE_PEEK_NODES
+    more nodes look for a next schedule; if none is reached by then the
+    cursor is kept, so a later page may come back empty.
+    mode="ranked" returns the `limit` best schedules for `preferences`
+    (see schedule_solver.compile_preferences), best first. The callback
+    fires once per result after the search, since the ranking is only
+    final then.
+
+    budget (schedule_solver.SearchBudget) bounds the search in time and
+    nodes and carries the cancellation check; when it runs out the
+    schedules found so far are returned and state["stopped"] receives the
+    reason ("time", "nodes" or "cancelled"), otherwise None.
+    """
+    if state is not None:
+        state["stopped"] = None
+    # Filters are compiled once into masks/sets and applied before the search
+    compiled = schedule_solver.compile_filters(filters)
+    valid = _compile_sections(sections_map, compiled)
+    if valid is None:
+        return []  # unsatisfiable
 
     sorted_codes = sorted(valid.keys(), key=lambda k: len(valid[k]))
     results = []
 
-    def bt(idx, current):
+    if mode in ("classes", "parallel", "scalable"):
+        budget = budget or schedule_solver.SearchBudget()  # carries the hasMore peek's node cap
+        pools, _, days, course_bits, compat = _compile_classes(valid, sorted_codes)
+        day_limit = _day_limit(days, compiled)
+        if mode == "scalable":
+            course_bits = schedule_solver.prune_domains(course_bits, compat)
+        weights = [len(p) for p in pools]
+        resume = cursor["path"] if cursor else None
+        skip = cursor["offset"] if cursor else 0
+        if mode == "parallel":
+            leaves = schedule_solver.iter_parallel(
+                course_bits, compat, workers, limit + skip, weights, resume, budget, day_limit,
+            )
+        else:
+            leaves = schedule_solver.iter_forward_checking(course_bits, compat, resume, budget=budget, day_limit=day_limit)
+
+        def expand():
+            for indices, path in leaves:
+                combos = itertools.product(*(pools[i] for i in indices))
+                offset = 0
+                if resume is not None and path == resume:
+                    # Part of this class combination was returned already
+                    combos = itertools.islice(combos, skip, None)
+                    offset = skip
+                for combo in combos:
+                    offset += 1
+                    yield list(combo), {"path": path, "offset": offset}
+
+        position = cursor
+        schedules = expand()
+        try:
+            for sched, position in schedules:
+                results.append(sched)
+                if on_new_schedule:
+                    on_new_schedule(list(sched))
+                if len(results) >= limit:
+                    break
+            exhausted = len(results) < limit
+        except schedule_solver.BudgetExceeded as e:
+            # Stopped early: the cursor still resumes after the last schedule returned
+            exhausted = False
+            if state is not None:
+                state["stopped"] = e.reason
+        else:
+            if not exhausted:
+                # hasMore peek on its own node cap; the page is complete either way
+                budget.cap_nodes(HAS_MORE_PEEK_NODES)
+                try:
+                    exhausted = next(schedules, None) is None
+                except schedule_solver.BudgetExceeded:
+                    pass
+        finally:
+            schedules.close()
+            leaves.close()
+        if state is not None:
+            state["cursor"] = None if exhausted else (position or {"path": [], "offset": 0})
+        return results
+
+    if mode in ("bitset", "forward", "ranked"):
+        # Parallel arrays over flat section indices; rows are only touched when emitting
+        models = [m for code in sorted_codes for m in valid[code]]
+        flat = [m.row for m in models]
+        masks = [m.mask for m in models]
+        days = [m.days for m in models]
+        course_bits, compat = schedule_solver.build_compatibility(
+            [[m.mask for m in valid[code]] for code in sorted_codes]
+        )
+        day_limit = _day_limit(days, compiled)
+
+        if mode == "ranked":
+            prefs = schedule_solver.compile_preferences(preferences)
+            penalties = [schedule_solver.section_penalty(m, prefs) for m in models]
+            ranked = schedule_solver.search_ranked(
+                course_bits, compat, masks, penalties, prefs, limit, budget, day_limit, days,
+            )
+            if state is not None and budget is not None:
+                state["stopped"] = budget.reason
+            for _, indices in ranked:
+                sched = [flat[i] for i in indices]
+                results.append(sched)
+                if on_new_schedule:
+                    on_new_schedule(list(sched))
+            return results
+
+        def on_leaf(indices):
+            sched = [flat[i] for i in indices]
+            results.append(sched)
+            if on_new_schedule:
+                on_new_schedule(list(sched))
+            return 1
+
+        search = schedule_solver.search_forward_checking if mode == "forward" else schedule_solver.search_compatible
+        try:
+            search(course_bits, compat, on_leaf, limit, budget=budget, day_limit=day_limit)
+        except schedule_solver.BudgetExceeded as e:
+            if state is not None:
+                state["stopped"] = e.reason
+        return results
+
+    max_days = compiled["max_days"]
+
+    def bt(idx, current, occupied, days):
+        if budget:
+            budget.tick()
+        if max_days is not None and days.bit_count() > max_days:
+            return
         if idx == len(sorted_codes):
             results.append(list(current))
             if on_new_schedule:
@@ -172,22 +337,102 @@ def _generate_schedules(sections_map, filters, on_new_schedule=None, limit=80):
             return
         if len(results) >= limit:
             return
-        for sec in valid[sorted_codes[idx]]:
-            if not any(_sections_conflict(sec, s) for s in current):
-                current.append(sec)
-                bt(idx + 1, current)
+        for model in valid[sorted_codes[idx]]:
+            # `occupied` is the union of the chosen sections' masks, `days` of their day masks
+            if not model.mask & occupied:
+                current.append(model.row)
+                bt(idx + 1, current, occupied | model.mask, days | model.days)
                 current.pop()
                 if len(results) >= limit:
                     return
 
-    bt(0, [])
+    try:
+        bt(0, [], 0, 0)
+    except schedule_solver.BudgetExceeded as e:
+        if state is not None:
+            state["stopped"] = e.reason
     return results
 
 
-def _fetch_sections_fuzzy(sb, table_name, semester, code):
+# ─── Shared result cache ─────────────────────────────────────────────
+# Completed generations keyed by (course table, data version, course set,
+# filters, preferences). Shared by every request served by this worker;
+# entries are dropped when parse_faculty reloads the table.
+SCHEDULE_CACHE_SIZE = int(os.environ.get("SCHEDULE_CACHE_SIZE", "64") or 0)
+_schedule_cache = OrderedDict()
+_schedule_cache_lock = threading.Lock()
+
+
+def _canonical_json(value):
+    """Order-insensitive JSON for cache keys (dict keys and list items sorted)."""
+    def norm(v):
+        if isinstance(v, dict):
+            return {str(k): norm(x) for k, x in v.items()}
+        if isinstance(v, (list, tuple)):
+            items = [norm(x) for x in v]
+            return sorted(items, key=lambda x: json.dumps(x, sort_keys=True, default=str))
+        if isinstance(v, str):
+            return v.strip().lower()
+        return v
+    return json.dumps(norm(value or {}), sort_keys=True, default=str)
+
+
+def _schedule_cache_key(table_name, version, course_codes, filters, preferences):
+    codes = tuple(sorted({c.upper().replace(" ", "") for c in course_codes}))
+    return (table_name, version, codes, _canonical_json(filters), _canonical_json(preferences))
+
+
+def _schedule_cache_get(key):
+    with _schedule_cache_lock:
+        hit = _schedule_cache.get(key)
+        if hit is not None:
+            _schedule_cache.move_to_end(key)
+        return hit
+
+
+def _schedule_cache_put(key, combinations):
+    if SCHEDULE_CACHE_SIZE <= 0:
+        return
+    with _schedule_cache_lock:
+        _schedule_cache[key] = combinations
+        _schedule_cache.move_to_end(key)
+        while len(_schedule_cache) > SCHEDULE_CACHE_SIZE:
+            _schedule_cache.popitem(last=False)
+
+
+def _invalidate_schedule_cache(table_name):
+    with _schedule_cache_lock:
+        for key in [k for k in _schedule_cache if k[0] == table_name]:
+            del _schedule_cache[key]
+
+
+def _get_course_data_version(sb, table_name):
+    """Current version of a course table, None if it was never recorded."""
+    try:
+        res = sb.table("course_data_versions").select("version").eq("table_name", table_name).maybe_single().execute()
+        return res.data.get("version") if res and res.data else None
+    except Exception as e:
+        logging.warning(f"Failed to read course data version for {table_name}: {e}")
+        return None
+
+
+def _bump_course_data_version(sb, table_name):
+    _invalidate_schedule_cache(table_name)
+    _drop_section_index(table_name)
+    try:
+        sb.table("course_data_versions").upsert({
+            "table_name": table_name,
+            "version": uuid.uuid4().hex,
+            "updated_at": _dt.now().isoformat(),
+        }).execute()
+    except Exception as e:
+        logging.warning(f"Failed to bump course data version for {table_name}: {e}")
+
+
+def _code_variants(code):
     """
-    Fetches sections for a code, supporting fuzzy 3-to-4 digit matching.
-    e.g., 'ENG101' matches 'ENG101', 'ENG7101', etc.
+    Codes a requested course may appear under, supporting fuzzy 3-to-4 digit matching.
+    e.g., 'ENG101' matches 'ENG101', 'ENG7101', 'ENG9101'; 'ENG7101' also matches 'ENG101'.
     """
     clean = code.upper().replace(" ", "")
     
@@ -195,7 +440,7 @@ def _fetch_sections_fuzzy(sb, table_name, semester, code):
     match = re.search(r"^([A-Z]+)(\d+)$", clean)
     if not match:
         # Fallback to direct match if it doesn't fit standard pattern
-        return sb.table(table_name).select("*").eq("semester", semester).eq("code", clean).execute().data or []
+        return [clean]
 
     letters = match.group(1)
     digits = match.group(2)
@@ -209,14 +454,337 @@ def _fetch_sections_fuzzy(sb, table_name, semester, code):
     elif len(digits) == 4:
         # If 4 digits, also look for 3 digits by dropping the first digit
         possible_codes.append(f"{letters}{str(digits)[1:]}")
+    return possible_codes
+
 
-    # Query using 'in' filter
+def _fetch_sections_batch(sb, table_name, semester, codes, page_size=1000):
+    """
+    Fetches sections for several requested codes with one `in_` query over
+    all their fuzzy variants (paged past PostgREST's row cap), then groups
+    the rows back per requested code. Returns {code: [rows]}.
+    """
+    variants = {code: _code_variants(code) for code in codes}
+    wanted = sorted({v for vs in variants.values() for v in vs})
+    rows = []
     try:
-        result = sb.table(table_name).select("*").eq("semester", semester).in_("code", possible_codes).execute()
-        return result.data or []
+        while True:
+            # doc_id: the one unique column of both courses_<semester> and the legacy courses table (no id)
+            page = sb.table(table_name).select("*").eq("semester", semester).in_("code", wanted) \
+                .order("doc_id").range(len(rows), len(rows) + page_size - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
     except Exception as e:
         logging.warning(f"Failed to query {table_name}: {e}")
-        return []
+        return {code: [] for code in codes}
+
+    by_code = {}
+    for row in rows:
+        by_code.setdefault((row.get("code") or "").upper(), []).append(row)
+    return {code: [r for v in vs for r in by_code.get(v, [])] for code, vs in variants.items()}
+
+
+def _normalize_section_keys(rows):
+    """Force camelCase session keys (backtracking logic and the app expect them)."""
+    for s in rows:
+        # Normalize sessions keys
+        if "sessions" in s and isinstance(s["sessions"], list):
+            for sess in s["sessions"]:
+                if "start_time" in sess:
+                    sess["startTime"] = sess.pop("start_time")
+                if "end_time" in sess:
+                    sess["endTime"] = sess.pop("end_time")
+                if "room_no" in sess:
+                    sess["roomNo"] = sess.pop("room_no")
+    return rows
+
+
+def _prepare_section_rows(rows):
+    """
+    Normalized keys plus the precomputed timing fields, filled in for rows
+    stored before course_parser emitted them, so the solver never parses
+    time strings per request.
+    """
+    _normalize_section_keys(rows)
+    for row in rows:
+        if any("dayMask" not in sess for sess in row.get("sessions") or []):
+            course_parser.add_timing_fields(row)
+    return rows
+
+
+# ─── Warm semester section index ─────────────────────────────────────
+# Whole courses_<semester> tables kept in memory per worker and keyed by
+# normalized code, so steady-state generation requests do no DB reads.
+# The data version is re-checked at most every SECTION_INDEX_TTL seconds.
+SECTION_INDEX_TTL = int(os.environ.get("SECTION_INDEX_TTL", "60") or 0)
+_section_indexes = {}
+_section_index_lock = threading.Lock()
+
+
+def _load_section_index(sb, table_name, semester, version, page_size=1000):
+    rows = []
+    try:
+        while True:
+            page = sb.table(table_name).select("*").eq("semester", semester) \
+                .order("id").range(len(rows), len(rows) + page_size - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+    except Exception as e:
+        logging.warning(f"Failed to load section index for {table_name}: {e}")
+        rows = []
+    _prepare_section_rows(rows)
+
+    by_code = {}
+    for row in rows:
+        by_code.setdefault((row.get("code") or "").upper(), []).append(row)
+    index = {"version": version, "checked_at": time.monotonic(), "by_code": by_code, "resolved": {}}
+
+    # Resolve the fuzzy variants up front: every stored code and its 3-digit alias
+    for code in list(by_code):
+        _index_lookup(index, code)
+        match = re.search(r"^([A-Z]+)\d(\d{3})$", code)
+        if match:
+            _index_lookup(index, match.group(1) + match.group(2))
+    return index
+
+
+def _index_lookup(index, code):
+    """Sections of a requested code in a section index (fuzzy 3/4-digit matching)."""
+    resolved = index["resolved"].get(code)
+    if resolved is None:
+        resolved = [r for v in _code_variants(code) for r in index["by_code"].get(v, [])]
+        index["resolved"][code] = resolved
+    return resolved
+
+
+def _get_section_index(sb, table_name, semester):
+    key = (table_name, semester)
+    with _section_index_lock:
+        index = _section_indexes.get(key)
+        if index and time.monotonic() - index["checked_at"] < SECTION_INDEX_TTL:
+            return index
+
+    version = _get_course_data_version(sb, table_name)
+    with _section_index_lock:
+        index = _section_indexes.get(key)
+        if index and version is not None and index["version"] == version:
+            index["checked_at"] = time.monotonic()
+            return index
+
+    index = _load_section_index(sb, table_name, semester, version)
+    with _section_index_lock:
+        _section_indexes[key] = index
+    return index
+
+
+def _drop_section_index(table_name):
+    with _section_index_lock:
+        for key in [k for k in _section_indexes if k[0] == table_name]:
+            del _section_indexes[key]
+
+
+def _lookup_sections_map(sb, index, semester, course_codes):
+    """Requested code -> sections, from the section index with one batched fallback query."""
+    sections_map = {}
+    requested = list(dict.fromkeys(code.upper().replace(" ", "") for code in course_codes))
+
+    # Try the dynamic table's index first
+    fetched = {code: _index_lookup(index, code) for code in requested}
+
+    # Fallback to standard courses table for codes the dynamic table lacks (one round-trip)
+    missing = [code for code in requested if not fetched[code]]
+    if missing:
+        for code, rows in _fetch_sections_batch(sb, "courses", semester, missing).items():
+            fetched[code] = _prepare_section_rows(rows)
+
+    for clean in requested:
+        secs = fetched[clean]
+        if not secs:
+            raise ValueError(f"No available sections found for {clean} in {semester}")
+        sections_map[clean] = secs
+    return sections_map
+
+
+def _section_ref(section):
+    """Stable reference to a section in compact storage (its doc_id)."""
+    return section.get("doc_id") or f"course_{section.get('code')}_{section.get('section')}"
+
+
+def _compact_combinations(combinations, sections=None):
+    """
+    Compact storage form of full-form combinations: each combination's
+    sections become a list of doc_ids (in position order) and every
+    distinct section is stored once in the `sections` dictionary
+    (doc_id -> section), which is returned alongside.
+    """
+    sections = {} if sections is None else sections
+    compact = []
+    for combo in combinations:
+        refs = []
+        for j in range(len(combo["sections"])):
+            sec = combo["sections"][str(j)]
+            ref = _section_ref(sec)
+            sections.setdefault(ref, sec)
+            refs.append(ref)
+        compact.append({"scheduleId": combo["scheduleId"], "sections": refs})
+    return compact, sections
+
+
+def _schedule_stream(sb, gen_id, append_mode, combinations=None, count=0, batch_seq=0, compact=False, sections=None):
+    """
+    Streams combinations into a schedule_generations row.
+
+    Returns (stream_callback, finish, added): stream_callback(sched) records a
+    schedule and pushes an update every few results, finish(**fields) writes
+    the final row update (plus any unsent batch), and `added` collects the
+    combinations produced through this writer (always in full form).
+    `combinations`/`sections` (full mode) or `count`/`batch_seq` (append
+    mode) continue an existing row.
+
+    With `compact`, combinations are stored as lists of section doc_ids and
+    the sections themselves once in a `sections` dictionary: on the row in
+    full mode, or per batch (only the sections new to that batch) in
+    append mode.
+    """
+    all_combinations = list(combinations or [])
+    all_sections = dict(sections or {})
+    added = []
+    pending = []  # append mode: combinations not yet written as a batch
+    pending_sections = {}  # append + compact: sections first used by the pending batch
+    state = {"count": count if append_mode else len(all_combinations), "seq": batch_seq}
+    batch_size = 5 # Update DB every N results
+
+    def flush_batch():
+        if not pending:
+            return
+        batch = {
+            "generation_id": gen_id,
+            "seq": state["seq"],
+            "combinations": list(pending),
+        }
+        if compact:
+            batch["sections"] = dict(pending_sections)
+        sb.table("schedule_generation_batches").insert(batch).execute()
+        state["seq"] += 1
+        pending.clear()
+        pending_sections.clear()
+
+    def stream_callback(new_sched):
+        combo = {
+            "scheduleId": state["count"],
+            "sections": {str(j): sec for j, sec in enumerate(new_sched)},
+        }
+        state["count"] += 1
+        added.append(combo)
+        stored = combo
+        if compact:
+            refs = []
+            for sec in new_sched:
+                ref = _section_ref(sec)
+                if ref not in all_sections:
+                    all_sections[ref] = sec
+                    if append_mode:
+                        pending_sections[ref] = sec
+                refs.append(ref)
+            stored = {"scheduleId": combo["scheduleId"], "sections": refs}
+        if append_mode:
+            pending.append(stored)
+        else:
+            all_combinations.append(stored)
+        
+        # Incremental update to database
+        if len(added) % batch_size == 0 or len(added) == 1:
+            try:
+                if append_mode:
+                    # Only the new combinations travel; the parent row carries the count
+                    flush_batch()
+                    sb.table("schedule_generations").update({
+                        "count": state["count"],
+                    }).eq("id", gen_id).execute()
+                else:
+                    update = {
+                        "combinations": all_combinations,
+                        "count": state["count"],
+                    }
+                    if compact:
+                        update["sections"] = all_sections
+                    sb.table("schedule_generations").update(update).eq("id", gen_id).execute()
+                logging.info(f"Streamed {state['count']} results for {gen_id}")
+            except Exception as e:
+                logging.warning(f"Failed to stream update: {e}")
+
+    def finish(**fields):
+        update = dict(fields, count=state["count"])
+        if append_mode:
+            flush_batch()
+        else:
+            update["combinations"] = all_combinations
+            if compact:
+                update["sections"] = all_sections
+        sb.table("schedule_generations").update(update).eq("id", gen_id).execute()
+        return state["count"]
+
+    return stream_callback, finish, added
+
+
+# Per-run solver budget: wall-clock seconds and search nodes (0 = unlimited)
+SCHEDULE_TIME_BUDGET = float(os.environ.get("SCHEDULE_TIME_BUDGET", "20") or 0)
+SCHEDULE_NODE_BUDGET = int(os.environ.get("SCHEDULE_NODE_BUDGET", "0") or 0)
+# Requests above MAX_STANDARD_COURSES use the scalable mode and the (tighter) large-request budget
+MAX_STANDARD_COURSES = 5
+MAX_COURSES = 8
+SCHEDULE_LARGE_TIME_BUDGET = float(os.environ.get("SCHEDULE_LARGE_TIME_BUDGET", "2") or 0)
+CANCEL_POLL_INTERVAL = 1.0 # seconds between cancellation checks against the row
+
+
+def _schedule_budget(sb, gen_id, course_count=0):
+    """SearchBudget for one run; cancelled once the row's status reads "cancelled" (see cancel_generation)."""
+    last_poll = [time.monotonic()]
+
+    def cancelled():
+        now = time.monotonic()
+        if now - last_poll[0] < CANCEL_POLL_INTERVAL:
+            return False
+        last_poll[0] = now
+        try:
+            res = sb.table("schedule_generations").select("status").eq("id", gen_id).maybe_single().execute()
+        except Exception as e:
+            logging.warning(f"Failed to poll cancellation for {gen_id}: {e}")
+            return False
+        return bool(res and res.data and res.data.get("status") == "cancelled")
+
+    return schedule_solver.SearchBudget(
+        seconds=_budget_seconds(course_count), nodes=SCHEDULE_NODE_BUDGET, cancelled=cancelled,
+    )
+
+
+def _budget_seconds(course_count):
+    seconds = SCHEDULE_TIME_BUDGET
+    if course_count > MAX_STANDARD_COURSES and SCHEDULE_LARGE_TIME_BUDGET:
+        seconds = min(seconds, SCHEDULE_LARGE_TIME_BUDGET) if seconds else SCHEDULE_LARGE_TIME_BUDGET
+    return seconds
+
+
+def _generation_outcome(solver_state, version):
+    """(status, cursor) for the final row update of a solver run."""
+    cursor = None
+    if solver_state.get("cursor") is not None:
+        cursor = {"position": solver_state["cursor"], "version": version}
+    stopped = solver_state.get("stopped")
+    if stopped is None:
+        return "completed", cursor
+    logging.info(f"Schedule search stopped early: {stopped}")
+    return ("cancelled" if stopped == "cancelled" else "partial"), cursor
+
+
+def _solver_mode(preferences, course_count):
+    # With preferences, return the best-scoring schedules instead of the first found
+    if preferences:
+        return "ranked"
+    if course_count > MAX_STANDARD_COURSES:
+        return "scalable"
+    return "parallel" if SCHEDULE_SOLVER_WORKERS > 1 else "classes"
 
 
 def handle_generate_schedules(body: dict) -> dict:
@@ -225,64 +793,113 @@ def handle_generate_schedules(body: dict) -> dict:
         "user_id": "uuid",
         "semester": "Spring2026",
         "courses": ["CSE101", "CSE311", ...],
-        "filters": { "exclude_days": ["Friday"] }   // optional
+        "filters": { "exclude_days": ["Friday"], "max_campus_days": 3 },  // optional, see schedule_solver.compile_filters
+        "preferences": {                             // optional: rank instead of first-found
+            "weights": { "campus_days": 1, "gaps": 0.5, "early_start": 1, "preferred_faculty": 1 },
+            "early_start_before": "10:00 AM",
+            "preferred_faculty": ["MAR"]
+        },
+        "stream_mode": "append",                     // optional, default "full"
+        "storage": "compact"                         // optional, default "full"
     }
     
     Fetches sections from dynamic course tables, runs backtracking,
     saves results to `schedule_generations`, returns generation ID.
     Supports fuzzy course matching (3-digit metadata -> 4-digit faculty data).
+
+    stream_mode "full" rewrites the whole `combinations` array on every
+    streamed batch. "append" writes each batch of new combinations as one
+    row of `schedule_generation_batches` (generation_id, seq) and leaves
+    only status/count on the parent row, so write volume grows linearly.
+
+    storage "compact" stores each combination as {"scheduleId", "sections":
+    [doc_id, ...]} and every distinct section once in a `sections`
+    dictionary (doc_id -> section) on the row, or per batch in append
+    mode; the app expands them. The row's storage_format says which.
+
+    Identical requests (same course table version, course set, filters and
+    preferences) are answered from a shared in-process LRU cache with an
+    already completed generation; the response then carries "cached": true.
+
+    Unranked runs store their search cursor on the row; "hasMore" tells
+    whether next_schedules_page can continue the generation.
+
+    Up to 8 courses are accepted; above 5 the "scalable" solver mode runs
+    under the tighter SCHEDULE_LARGE_TIME_BUDGET.
+
+    The search runs under SCHEDULE_TIME_BUDGET seconds / SCHEDULE_NODE_BUDGET
+    nodes; when either runs out the row ends "partial" with the schedules
+    found so far ("partial": true). cancel_generation ends it "cancelled".
     """
     user_id = body.get("user_id")
     semester = body.get("semester", "").replace(" ", "")
     course_codes = body.get("courses", [])
     filters = body.get("filters", {})
+    preferences = body.get("preferences")
+    append_mode = body.get("stream_mode") == "append"
+    compact = body.get("storage") == "compact"
 
     if not user_id or not semester or not course_codes:
         raise ValueError("user_id, semester, and courses are required")
 
-    # Enforce 3-5 course limit
-    if len(course_codes) < 3 or len(course_codes) > 5:
-        raise ValueError(f"Schedule generation requires 3-5 courses. Received: {len(course_codes)}")
+    # Enforce 3-8 course limit
+    if len(course_codes) < 3 or len(course_codes) > MAX_COURSES:
+        raise ValueError(f"Schedule generation requires 3-{MAX_COURSES} courses. Received: {len(course_codes)}")
 
     sb = _get_supabase()
-
-    # 1) Fetch sections for each course (Fuzzy)
-    sections_map = {}
     actual_table = f"courses_{semester.lower()}"
-    
-    for code in course_codes:
-        clean = code.upper().replace(" ", "")
-        
-        # Try dynamic table first
-        secs = _fetch_sections_fuzzy(sb, actual_table, semester, clean)
-        
-        # Fallback to standard courses table if dynamic table is empty/missing
-        if not secs:
-            secs = _fetch_sections_fuzzy(sb, "courses", semester, clean)
-            
-        if not secs:
-            raise ValueError(f"No available sections found for {clean} in {semester}")
-        
-        # Normalize field names (Force camelCase for backtracking logic consistency)
-        for s in secs:
-            # Normalize sessions keys
-            if "sessions" in s and isinstance(s["sessions"], list):
-                for sess in s["sessions"]:
-                    if "start_time" in sess:
-                        sess["startTime"] = sess.pop("start_time")
-                    if "end_time" in sess:
-                        sess["endTime"] = sess.pop("end_time")
-                    if "room_no" in sess:
-                        sess["roomNo"] = sess.pop("room_no")
-        
-        sections_map[clean] = secs
+
+    # Warm per-worker copy of the semester's course table (reloaded on version change)
+    index = _get_section_index(sb, actual_table, semester)
+
+    # 0) Shared result cache: identical requests against the same course data
+    cache_key = _schedule_cache_key(actual_table, index["version"], course_codes, filters, preferences)
+    cached = _schedule_cache_get(cache_key)
+    if cached is not None:
+        gen_id = str(uuid.uuid4())
+        combinations, sections = cached["combinations"], None
+        if compact:
+            combinations, sections = _compact_combinations(combinations)
+        record = {
+            "id": gen_id,
+            "user_id": user_id,
+            "semester": semester,
+            "courses": course_codes,
+            "filters": filters,
+            "combinations": [] if append_mode else combinations,
+            "status": "completed",
+            "count": len(combinations),
+            "cursor": cached["cursor"],
+        }
+        if append_mode:
+            record["stream_mode"] = "append"
+        if compact:
+            record["storage_format"] = "compact"
+            if not append_mode:
+                record["sections"] = sections
+        sb.table("schedule_generations").upsert(record).execute()
+        if append_mode:
+            batch = {"generation_id": gen_id, "seq": 0, "combinations": combinations}
+            if compact:
+                batch["sections"] = sections
+            sb.table("schedule_generation_batches").insert(batch).execute()
+        logging.info(f"Schedule cache hit for {cache_key[2]} -> {gen_id}")
+        return {
+            "status": "ok",
+            "generationId": gen_id,
+            "count": len(cached["combinations"]),
+            "hasMore": cached["cursor"] is not None,
+            "cached": True,
+        }
+
+    # 1) Look up sections for all courses (Fuzzy)
+    sections_map = _lookup_sections_map(sb, index, semester, course_codes)
 
     # 2) Save initial "processing" state to schedule_generations
-    import uuid
     gen_id = str(uuid.uuid4())
     
     # Pre-create the record so the app can start streaming
-    sb.table("schedule_generations").upsert({
+    record = {
         "id": gen_id,
         "user_id": user_id,
         "semester": semester,
@@ -291,51 +908,480 @@ def handle_generate_schedules(body: dict) -> dict:
         "combinations": [],
         "status": "processing",
         "count": 0,
-    }).execute()
+    }
+    if append_mode:
+        record["stream_mode"] = "append"
+    if compact:
+        record["storage_format"] = "compact"
+    sb.table("schedule_generations").upsert(record).execute()
 
-    all_combinations = []
-    batch_size = 5 # Update DB every N results
+    stream_callback, finish, all_combinations = _schedule_stream(sb, gen_id, append_mode, compact=compact)
 
-    def stream_callback(new_sched):
-        nonlocal all_combinations
-        combo = {
-            "scheduleId": len(all_combinations),
-            "sections": {str(j): sec for j, sec in enumerate(new_sched)},
-        }
-        all_combinations.append(combo)
-        
-        # Incremental update to database
-        if len(all_combinations) % batch_size == 0 or len(all_combinations) == 1:
-            try:
-                sb.table("schedule_generations").update({
-                    "combinations": all_combinations,
-                    "count": len(all_combinations),
-                }).eq("id", gen_id).execute()
-                logging.info(f"Streamed {len(all_combinations)} results for {gen_id}")
-            except Exception as e:
-                logging.warning(f"Failed to stream update: {e}")
+    # 3) Generate (with streaming callback), bounded by the time/node budget
+    solver_state = {}
+    try:
+        schedules = _generate_schedules(
+            sections_map, filters, on_new_schedule=stream_callback, limit=80,
+            mode=_solver_mode(preferences, len(sections_map)), preferences=preferences, workers=SCHEDULE_SOLVER_WORKERS,
+            state=solver_state, budget=_schedule_budget(sb, gen_id, len(sections_map)),
+        )
+    except Exception:
+        sb.table("schedule_generations").update({"status": "failed"}).eq("id", gen_id).execute()
+        raise
+
+    # Search position after the last schedule, for next_schedules_page
+    status, cursor = _generation_outcome(solver_state, index["version"])
 
-    # 3) Generate (with streaming callback)
-    schedules = _generate_schedules(sections_map, filters, on_new_schedule=stream_callback, limit=80)
+    if status == "cancelled":
+        finish(status="cancelled", cursor=cursor)
+        return {"status": "cancelled", "generationId": gen_id, "count": len(all_combinations)}
 
     if not schedules:
         sb.table("schedule_generations").update({"status": "failed"}).eq("id", gen_id).execute()
+        if status == "partial":
+            raise ValueError("No valid schedule found within the time limit. Try removing a course or loosening filters.")
         raise ValueError("No valid schedule combinations found. Try adjusting filters or removing courses with no seats.")
 
-    # 4) Final Update (Set status to completed)
-    sb.table("schedule_generations").update({
-        "combinations": all_combinations,
-        "status": "completed",
-        "count": len(all_combinations),
-    }).eq("id", gen_id).execute()
+    # Only complete searches are shared; a partial one depends on load
+    if status == "completed":
+        _schedule_cache_put(cache_key, {"combinations": all_combinations, "cursor": cursor})
+
+    # 4) Final Update ("completed", or "partial" when the budget ran out)
+    finish(status=status, cursor=cursor)
 
     return {
         "status": "ok",
         "generationId": gen_id,
         "count": len(all_combinations),
+        "hasMore": cursor is not None,
+        "partial": status == "partial",
+    }
+
+
+def handle_next_schedules_page(body: dict) -> dict:
+    """
+    Input:  { "user_id": "uuid", "generation_id": "uuid" }
+
+    Resumes a finished generation from the search cursor stored on its
+    `schedule_generations` row and appends the next 80 schedules to it
+    (streamed the same way as the first page), instead of regenerating
+    and returning the same first results again. Partial and cancelled
+    generations resume after the last schedule they stored.
+    """
+    user_id = body.get("user_id")
+    gen_id = body.get("generation_id")
+    if not user_id or not gen_id:
+        raise ValueError("user_id and generation_id are required")
+
+    sb = _get_supabase()
+    res = sb.table("schedule_generations").select("*").eq("id", gen_id).maybe_single().execute()
+    row = res.data if res else None
+    if not row or row.get("user_id") != user_id:
+        raise ValueError(f"Generation not found: {gen_id}")
+
+    cursor = row.get("cursor")
+    if not cursor:
+        return {"status": "ok", "generationId": gen_id, "count": row.get("count") or 0, "added": 0, "hasMore": False}
+
+    semester = row.get("semester") or ""
+    actual_table = f"courses_{semester.lower()}"
+    index = _get_section_index(sb, actual_table, semester)
+    if cursor.get("version") != index["version"]:
+        raise ValueError("Course data changed since this generation was created. Please generate schedules again.")
+
+    sections_map = _lookup_sections_map(sb, index, semester, row.get("courses") or [])
+    append_mode = row.get("stream_mode") == "append"
+
+    batch_seq = 0
+    if append_mode:
+        last = sb.table("schedule_generation_batches").select("seq").eq("generation_id", gen_id) \
+            .order("seq", desc=True).limit(1).execute().data or []
+        batch_seq = last[0]["seq"] + 1 if last else 0
+
+    sb.table("schedule_generations").update({"status": "processing"}).eq("id", gen_id).execute()
+    stream_callback, finish, added = _schedule_stream(
+        sb, gen_id, append_mode, combinations=row.get("combinations"), count=row.get("count") or 0, batch_seq=batch_seq,
+        compact=row.get("storage_format") == "compact", sections=row.get("sections"),
+    )
+
+    solver_state = {}
+    try:
+        _generate_schedules(
+            sections_map, row.get("filters") or {}, on_new_schedule=stream_callback, limit=80,
+            mode=_solver_mode(None, len(sections_map)), workers=SCHEDULE_SOLVER_WORKERS,
+            cursor=cursor["position"], state=solver_state, budget=_schedule_budget(sb, gen_id, len(sections_map)),
+        )
+    except Exception:
+        finish(status="failed", cursor=cursor)
+        raise
+
+    status, next_cursor = _generation_outcome(solver_state, index["version"])
+    total = finish(status=status, cursor=next_cursor)
+
+    return {
+        "status": "cancelled" if status == "cancelled" else "ok",
+        "generationId": gen_id,
+        "count": total,
+        "added": len(added),
+        "hasMore": next_cursor is not None,
+        "partial": status == "partial",
     }
 
 
+# Batch generation: jobs per request, rows and JSON bytes per bulk insert (a
+# full-storage row holds up to 80 whole combinations), and the wall-clock
+# budget of the whole request in seconds (kept under the HTTP trigger's ~230 s
+# timeout; 0 = unlimited)
+MAX_BATCH_JOBS = int(os.environ.get("MAX_BATCH_JOBS", "5000") or 0)
+BATCH_INSERT_SIZE = 100
+BATCH_INSERT_BYTES = 1_000_000
+BATCH_TIME_BUDGET = float(os.environ.get("BATCH_TIME_BUDGET", "180") or 0)
+
+
+def _solve_batch_job(sections_map, filters, preferences, deadline=None):
+    """
+    One distinct course set of a batch (runs in the solver pool when
+    SCHEDULE_SOLVER_WORKERS > 1). Returns (combinations, status, position).
+    The search budget is capped at what is left until `deadline` (a
+    time.time() value); a job reached after it raises TimeoutError.
+    """
+    seconds = _budget_seconds(len(sections_map))
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError("Batch time budget ran out before this job was solved")
+        seconds = min(seconds, remaining) if seconds else remaining
+    mode = _solver_mode(preferences, len(sections_map))
+    if mode == "parallel":
+        mode = "classes"  # already one job per pool process
+    state = {}
+    budget = schedule_solver.SearchBudget(seconds=seconds, nodes=SCHEDULE_NODE_BUDGET)
+    combinations = _generate_schedules(
+        sections_map, filters, limit=80, mode=mode, preferences=preferences, state=state, budget=budget,
+    )
+    status, _ = _generation_outcome(state, None)
+    return combinations, status, state.get("cursor")
+
+
+def handle_generate_batch(body: dict) -> dict:
+    """
+    Input:  {
+        "semester": "Spring2026",
+        "jobs": [
+            { "user_id": "uuid", "courses": ["CSE101", ...], "filters": {...}, "preferences": {...} },
+            ...
+        ],
+        "storage": "compact"        // optional, default "full"
+    }
+
+    Precomputes generations for many students at once (advising-day
+    cohorts). The semester's sections are loaded once, jobs with the same
+    course set, filters and preferences are solved once (or answered from
+    the shared result cache), distinct jobs are solved in the solver pool
+    when SCHEDULE_SOLVER_WORKERS > 1, and the `schedule_generations` rows
+    are written with bulk inserts of at most BATCH_INSERT_SIZE rows and
+    about BATCH_INSERT_BYTES of JSON as soon as a chunk is ready. Each row is what generate_schedules would have stored (full
+    stream mode), so next_schedules_page and swap_course work on them.
+
+    The whole request runs under BATCH_TIME_BUDGET seconds: each search is
+    capped at the time left, and jobs not started by then are reported as
+    errors while the rows already solved are kept.
+
+    Returns one entry per job, in order: {"user_id", "generationId",
+    "count", "partial"}, or {"user_id", "error"} for a job that could not
+    be solved (bad input, no schedules, out of time); the other jobs are
+    unaffected.
+    """
+    semester = body.get("semester", "").replace(" ", "")
+    jobs = body.get("jobs") or []
+    compact = body.get("storage") == "compact"
+    if not semester or not jobs:
+        raise ValueError("semester and jobs are required")
+    if MAX_BATCH_JOBS and len(jobs) > MAX_BATCH_JOBS:
+        raise ValueError(f"At most {MAX_BATCH_JOBS} jobs per batch. Received: {len(jobs)}")
+    deadline = time.time() + BATCH_TIME_BUDGET if BATCH_TIME_BUDGET else None
+
+    sb = _get_supabase()
+    actual_table = f"courses_{semester.lower()}"
+    index = _get_section_index(sb, actual_table, semester)
+
+    # 1) Validate and group identical jobs
+    results = [None] * len(jobs)
+    groups = OrderedDict()  # cache key -> {"job": first job, "members": [positions]}
+    for pos, job in enumerate(jobs):
+        course_codes = job.get("courses") or []
+        if not job.get("user_id") or not course_codes:
+            results[pos] = {"user_id": job.get("user_id"), "error": "user_id and courses are required"}
+            continue
+        if len(course_codes) < 3 or len(course_codes) > MAX_COURSES:
+            results[pos] = {
+                "user_id": job["user_id"],
+                "error": f"Schedule generation requires 3-{MAX_COURSES} courses. Received: {len(course_codes)}",
+            }
+            continue
+        key = _schedule_cache_key(actual_table, index["version"], course_codes, job.get("filters") or {}, job.get("preferences"))
+        groups.setdefault(key, {"job": job, "members": []})["members"].append(pos)
+
+    # 2) One row per job, inserted in chunks while the remaining jobs are solved
+    records = []
+    rows = 0
+    pending_bytes = 0
+
+    def flush():
+        nonlocal rows, pending_bytes
+        if records:
+            sb.table("schedule_generations").insert(records[:]).execute()
+            rows += len(records)
+            records.clear()
+            pending_bytes = 0
+
+    def emit(key, outcome):
+        nonlocal pending_bytes
+        group = groups[key]
+        if "error" in outcome:
+            for pos in group["members"]:
+                results[pos] = {"user_id": jobs[pos]["user_id"], "error": outcome["error"]}
+            return
+        combinations, sections = outcome["combinations"], None
+        if compact:
+            combinations, sections = _compact_combinations(outcome["combinations"])
+        # Every member's row carries the same payload; measured once per group
+        row_bytes = len(json.dumps([combinations, sections], default=str))
+        for pos in group["members"]:
+            job = jobs[pos]
+            gen_id = str(uuid.uuid4())
+            record = {
+                "id": gen_id,
+                "user_id": job["user_id"],
+                "semester": semester,
+                "courses": job["courses"],
+                "filters": job.get("filters") or {},
+                "combinations": combinations,
+                "status": outcome["status"],
+                "count": len(combinations),
+                "cursor": outcome["cursor"],
+            }
+            if compact:
+                record["storage_format"] = "compact"
+                record["sections"] = sections
+            results[pos] = {
+                "user_id": job["user_id"],
+                "generationId": gen_id,
+                "count": len(combinations),
+                "partial": outcome["status"] == "partial",
+            }
+            if len(records) >= BATCH_INSERT_SIZE or (records and pending_bytes + row_bytes > BATCH_INSERT_BYTES):
+                flush()
+            records.append(record)
+            pending_bytes += row_bytes
+
+    def finish(key, solve, *args):
+        try:
+            schedules, status, position = solve(*args)
+        except Exception as e:
+            logging.warning(f"Batch job failed: {e}")
+            emit(key, {"error": str(e)})
+            return
+        if not schedules:
+            emit(key, {"error": "No valid schedule combinations found."})
+            return
+        combinations = [
+            {"scheduleId": i, "sections": {str(j): sec for j, sec in enumerate(sched)}}
+            for i, sched in enumerate(schedules)
+        ]
+        cursor = {"position": position, "version": index["version"]} if position is not None else None
+        if status == "completed":
+            _schedule_cache_put(key, {"combinations": combinations, "cursor": cursor})
+        emit(key, {"combinations": combinations, "status": status, "cursor": cursor})
+
+    # 3) Solve each distinct job once
+    pending = []
+    for key, group in groups.items():
+        cached = _schedule_cache_get(key)
+        if cached is not None:
+            emit(key, {"combinations": cached["combinations"], "status": "completed", "cursor": cached["cursor"]})
+            continue
+        job = group["job"]
+        try:
+            sections_map = _lookup_sections_map(sb, index, semester, job["courses"])
+        except ValueError as e:
+            emit(key, {"error": str(e)})
+            continue
+        pending.append((key, (sections_map, job.get("filters") or {}, job.get("preferences"), deadline)))
+
+    if SCHEDULE_SOLVER_WORKERS > 1 and len(pending) > 1:
+        pool = schedule_solver.get_pool(SCHEDULE_SOLVER_WORKERS)
+        futures = {pool.submit(_solve_batch_job, *args): key for key, args in pending}
+        for fut in as_completed(futures):
+            finish(futures[fut], fut.result)
+    else:
+        for key, args in pending:
+            finish(key, _solve_batch_job, *args)
+    flush()
+
+    logging.info(f"Batch generation: {len(jobs)} jobs, {len(groups)} distinct, {len(pending)} solved, {rows} rows")
+    return {
+        "status": "ok",
+        "jobs": len(jobs),
+        "distinct": len(groups),
+        "solved": len(pending),
+        "generations": results,
+    }
+
+
+def _load_combination(sb, row, schedule_id):
+    """Sections (full form, position order) of one stored combination of a generation, or None."""
+    if row.get("stream_mode") == "append":
+        parts = sb.table("schedule_generation_batches").select("combinations, sections") \
+            .eq("generation_id", row["id"]).execute().data or []
+    else:
+        parts = [row]
+    sections = {}
+    for part in parts:
+        sections.update(part.get("sections") or {})
+    for part in parts:
+        for combo in part.get("combinations") or []:
+            if combo.get("scheduleId") != schedule_id:
+                continue
+            secs = combo["sections"]
+            if isinstance(secs, list):  # compact storage
+                return [sections[ref] for ref in secs]
+            return [secs[str(j)] for j in range(len(secs))]
+    return None
+
+
+def handle_swap_course(body: dict) -> dict:
+    """
+    Input:  {
+        "user_id": "uuid",
+        "generation_id": "uuid",
+        "schedule_id": 3,        // scheduleId of the combination to start from
+        "course": "MAT104"       // course to vary (in the schedule) or add (not in it)
+    }
+
+    Returns the sections of `course` that fit around the other sections of
+    the chosen combination under the generation's filters, by checking
+    each candidate against the fixed sections' occupancy mask. The section
+    the combination already holds is not among them. Nothing is
+    regenerated or written.
+    """
+    user_id = body.get("user_id")
+    gen_id = body.get("generation_id")
+    schedule_id = body.get("schedule_id")
+    course = (body.get("course") or "").upper().replace(" ", "")
+    if not user_id or not gen_id or schedule_id is None or not course:
+        raise ValueError("user_id, generation_id, schedule_id and course are required")
+
+    sb = _get_supabase()
+    res = sb.table("schedule_generations").select("*").eq("id", gen_id).maybe_single().execute()
+    row = res.data if res else None
+    if not row or row.get("user_id") != user_id:
+        raise ValueError(f"Generation not found: {gen_id}")
+
+    sched = _load_combination(sb, row, int(schedule_id))
+    if sched is None:
+        raise ValueError(f"Schedule {schedule_id} not found in generation {gen_id}")
+
+    variants = set(_code_variants(course))
+    fixed = [sec for sec in sched if (sec.get("code") or "").upper().replace(" ", "") not in variants]
+    current = [sec for sec in sched if sec not in fixed]
+    if not current and len(fixed) + 1 > MAX_COURSES:
+        raise ValueError(f"Schedule generation requires 3-{MAX_COURSES} courses. Received: {len(fixed) + 1}")
+
+    semester = row.get("semester") or ""
+    index = _get_section_index(sb, f"courses_{semester.lower()}", semester)
+    candidates = _lookup_sections_map(sb, index, semester, [course])[course]
+
+    compiled = schedule_solver.compile_filters(row.get("filters") or {})
+    valid = _compile_sections({course: candidates}, compiled) or {course: []}
+    occupied = 0
+    for sec in fixed:
+        occupied |= schedule_solver.section_mask(sec)
+    max_days = compiled["max_days"]
+    chosen = {_section_ref(sec) for sec in current}
+    alternatives = [
+        model.row for model in valid[course]
+        if _section_ref(model.row) not in chosen
+        and not model.mask & occupied
+        and (max_days is None or schedule_solver.campus_days(occupied | model.mask) <= max_days)
+    ]
+
+    return {
+        "status": "ok",
+        "generationId": gen_id,
+        "scheduleId": schedule_id,
+        "course": course,
+        "action": "swap" if current else "add",
+        "current": [_section_ref(sec) for sec in current],
+        "count": len(alternatives),
+        "alternatives": alternatives,
+    }
+
+
+def handle_cancel_generation(body: dict) -> dict:
+    """
+    Input:  { "user_id": "uuid", "generation_id": "uuid" }
+
+    Marks a running generation "cancelled". The solver polls the row and
+    stops at its next budget check, keeping the schedules streamed so far.
+    """
+    user_id = body.get("user_id")
+    gen_id = body.get("generation_id")
+    if not user_id or not gen_id:
+        raise ValueError("user_id and generation_id are required")
+
+    sb = _get_supabase()
+    res = sb.table("schedule_generations").select("user_id, status").eq("id", gen_id).maybe_single().execute()
+    row = res.data if res else None
+    if not row or row.get("user_id") != user_id:
+        raise ValueError(f"Generation not found: {gen_id}")
+
+    if row.get("status") != "processing":
+        return {"status": "ok", "generationId": gen_id, "cancelled": False}
+    sb.table("schedule_generations").update({"status": "cancelled"}) \
+        .eq("id", gen_id).eq("status", "processing").execute()
+    return {"status": "ok", "generationId": gen_id, "cancelled": True}
+
+
+def handle_count_schedules(body: dict) -> dict:
+    """
+    Input:  {
+        "semester": "Spring2026",
+        "courses": ["CSE101", "CSE311", ...],
+        "filters": { "exclude_days": ["Friday"], "max_campus_days": 3 },  // optional, see schedule_solver.compile_filters
+        "cap": 1000                                 // optional
+    }
+
+    Counts the valid schedule combinations for a course set without
+    generating or storing them (nothing is written to the database), for
+    a live "N possible schedules" hint. With `cap`, counting stops once
+    the count reaches it and the response carries "capped": true.
+    """
+    semester = body.get("semester", "").replace(" ", "")
+    course_codes = body.get("courses", [])
+    filters = body.get("filters", {})
+    cap = body.get("cap")
+
+    if not semester or not course_codes:
+        raise ValueError("semester and courses are required")
+    # No minimum: the hint is shown while the first courses are being picked
+    if len(course_codes) > MAX_COURSES:
+        raise ValueError(f"Schedule counting accepts at most {MAX_COURSES} courses. Received: {len(course_codes)}")
+    if cap is not None:
+        cap = int(cap)
+        if cap <= 0:
+            raise ValueError("cap must be a positive integer")
+
+    sb = _get_supabase()
+    actual_table = f"courses_{semester.lower()}"
+    index = _get_section_index(sb, actual_table, semester)
+    sections_map = _lookup_sections_map(sb, index, semester, course_codes)
+
+    count = _count_schedules(sections_map, filters, cap)
+    capped = cap is not None and count >= cap
+    return {"status": "ok", "count": cap if capped else count, "capped": capped}
+
+
 # ═══════════════════════════════════════════════════════════════════
 #  4. STORAGE WEBHOOK & SHARED PARSING LOGIC
 # ═══════════════════════════════════════════════════════════════════
@@ -364,32 +1410,277 @@ def _get_semester_from_path(file_path: str) -> tuple:
     return sem_code, table_sem_code, f"{sem} {year}", filename, is_dept
 
 def handle_parse_faculty(body: dict) -> dict:
-    """Manual trigger: { "file_path": "facultylist/Spring 2026.pdf" }"""
+    """Manual trigger: { "file_path": "facultylist/Spring 2026.pdf", "force": false }  (force: re-parse an unchanged file)"""
     file_path = body.get("file_path")
     if not file_path: raise ValueError("file_path is required")
-    return _do_parse_faculty(file_path)
+    return _do_parse_faculty(file_path, force=bool(body.get("force")))
 
 def handle_parse_calendar(body: dict) -> dict:
-    """Manual trigger: { "file_path": "calendar/Spring 2026.pdf" }"""
+    """Manual trigger: { "file_path": "calendar/Spring 2026.pdf", "force": false }  (force: re-parse an unchanged file)"""
     file_path = body.get("file_path")
     if not file_path: raise ValueError("file_path is required")
-    return _do_parse_calendar(file_path)
+    return _do_parse_calendar(file_path, force=bool(body.get("force")))
 
 def handle_parse_exam(body: dict) -> dict:
-    """Manual trigger: { "file_path": "examschedule/Spring 2026.pdf" }"""
+    """Manual trigger: { "file_path": "examschedule/Spring 2026.pdf", "force": false }  (force: re-parse an unchanged file)"""
     file_path = body.get("file_path")
     if not file_path: raise ValueError("file_path is required")
-    return _do_parse_exam(file_path)
+    return _do_parse_exam(file_path, force=bool(body.get("force")))
 
 def handle_parse_advising(body: dict) -> dict:
-    """Manual trigger: { "file_path": "advisingschedule/Spring 2026.eml" }"""
+    """Manual trigger: { "file_path": "advisingschedule/Spring 2026.eml", "force": false }  (force: re-parse an unchanged file)"""
     file_path = body.get("file_path")
     if not file_path: raise ValueError("file_path is required")
-    return _do_parse_advising(file_path)
+    return _do_parse_advising(file_path, force=bool(body.get("force")))
+
+# ─── Parse cache ─────────────────────────────────────────────────────
+# Content hash and parser version of the last successful parse per
+# (folder, semester). A re-upload of a byte-identical file, parsed by the
+# same parser version, returns the stored summary without parsing or
+# writing anything. Bump a parser module's PARSER_VERSION when its output
+# changes.
+
+def _parse_cache_key(file_path, semester_key):
+    folder = file_path.split("/")[0].lower() if "/" in file_path else ""
+    return folder, (semester_key or "").lower()
+
+
+def _parse_cache_lookup(sb, key, digest, parser_version):
+    """Stored summary of the last parse of this exact content, or None."""
+    try:
+        res = sb.table("document_parse_cache").select("content_hash, parser_version, summary") \
+            .eq("folder", key[0]).eq("semester_code", key[1]).maybe_single().execute()
+    except Exception as e:
+        logging.warning(f"Failed to read parse cache for {key}: {e}")
+        return None
+    row = res.data if res else None
+    if row and row.get("content_hash") == digest and row.get("parser_version") == parser_version:
+        return row.get("summary")
+    return None
+
+
+def _parse_cache_store(sb, key, digest, parser_version, summary):
+    try:
+        sb.table("document_parse_cache").upsert({
+            "folder": key[0],
+            "semester_code": key[1],
+            "content_hash": digest,
+            "parser_version": parser_version,
+            "summary": summary,
+            "updated_at": _dt.now().isoformat(),
+        }, on_conflict="folder,semester_code").execute()
+    except Exception as e:
+        logging.warning(f"Failed to store parse cache for {key}: {e}")
+
+# ─── Incremental table sync ──────────────────────────────────────────
+# Parsed documents replace a per-semester table by diffing against its
+# current rows instead of delete-all + reinsert, so readers never see an
+# empty table and unchanged rows cost no writes.
+SYNC_BATCH_SIZE = 100
+SYNC_WRITERS = 4  # concurrent upsert requests of a streamed sync
+SYNC_QUEUE_BATCHES = 8  # batches waiting for a writer before the producer blocks
+
+
+def _row_fingerprint(row, columns):
+    """Hashable form of a row's values in `columns` (3 and 3.0 compare equal)."""
+    def norm(v):
+        if isinstance(v, float) and v.is_integer():
+            return int(v)
+        if isinstance(v, dict):
+            return {k: norm(x) for k, x in v.items()}
+        if isinstance(v, list):
+            return [norm(x) for x in v]
+        return v
+    return json.dumps([norm(row.get(c)) for c in columns], sort_keys=True, default=str)
+
+
+def _fetch_table_rows(sb, table_name, page_size=1000):
+    """
+    Every row of `table_name`, paged in id order (PostgREST pages are only
+    stable with an order). A row seen on two pages because of a concurrent
+    write is returned once, so the sync never takes it for a stale copy.
+    """
+    rows, seen, offset = [], set(), 0
+    while True:
+        page = sb.table(table_name).select("*").order("id") \
+            .range(offset, offset + page_size - 1).execute().data or []
+        offset += len(page)
+        for row in page:
+            if row["id"] not in seen:
+                seen.add(row["id"])
+                rows.append(row)
+        if len(page) < page_size:
+            return rows
+
+
+def _sync_table(sb, table_name, rows, key=None):
+    """
+    Makes `table_name` hold exactly `rows`, writing only the difference.
+
+    With `key` (a unique column such as doc_id) rows are matched by it
+    (see _sync_table_stream). Without one, rows are matched by their full
+    content, so a changed row is a delete plus an insert. Existing rows
+    that are no longer parsed are deleted by id, after the writes. Only
+    the columns present in `rows` are compared.
+
+    Returns {"inserted", "updated", "deleted", "unchanged"} row counts.
+    """
+    if key:
+        return _sync_table_stream(sb, table_name, rows, key)
+
+    columns = sorted({c for row in rows for c in row})
+    current = {}
+    for row in _fetch_table_rows(sb, table_name):
+        current.setdefault(_row_fingerprint(row, columns), []).append(row["id"])
+    inserts = []
+    for row in rows:
+        ids = current.get(_row_fingerprint(row, columns))
+        if ids:
+            ids.pop()
+        else:
+            inserts.append(row)
+    stale = [row_id for ids in current.values() for row_id in ids]
+    for i in range(0, len(inserts), SYNC_BATCH_SIZE):
+        sb.table(table_name).insert(inserts[i:i + SYNC_BATCH_SIZE]).execute()
+    for i in range(0, len(stale), SYNC_BATCH_SIZE):
+        sb.table(table_name).delete().in_("id", stale[i:i + SYNC_BATCH_SIZE]).execute()
+
+    return {"inserted": len(inserts), "updated": 0, "deleted": len(stale), "unchanged": len(rows) - len(inserts)}
+
+
+def _sync_table_stream(sb, table_name, rows, key):
+    """
+    Keyed table sync over an iterable of rows, e.g. course_parser.iter_course_rows.
+
+    New keys and changed rows are collected into SYNC_BATCH_SIZE batches
+    and upserted on `key` by SYNC_WRITERS threads fed through a bounded
+    queue (SYNC_QUEUE_BATCHES). Producing rows therefore overlaps with
+    writing them, and only the batches in flight are held. The existing
+    table is kept as one fingerprint per key. A key yielded again later
+    is written once more after the concurrent writes, so the last version
+    wins. Rows left unseen are deleted by id at the end. An empty stream
+    changes nothing.
+    """
+    existing, stale = {}, []
+    for row in _fetch_table_rows(sb, table_name):
+        if row.get(key) is None:
+            stale.append(row["id"])  # unkeyed legacy rows
+        elif row[key] in existing:
+            if existing[row[key]]["id"] != row["id"]:
+                stale.append(row["id"])  # duplicate legacy rows
+        else:
+            existing[row[key]] = row
+    fingerprints = None
+    status = {}  # key -> "inserted" | "updated" | "unchanged"
+    late = {}  # rows yielded again: written after the concurrent batches
+    errors = []
+    work = queue.Queue(maxsize=SYNC_QUEUE_BATCHES)
+
+    def writer():
+        while True:
+            batch = work.get()
+            if batch is None:
+                return
+            try:
+                if not errors:
+                    sb.table(table_name).upsert(batch, on_conflict=key).execute()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=writer, daemon=True) for _ in range(SYNC_WRITERS)]
+    for t in threads:
+        t.start()
+    batch = []
+    try:
+        for row in rows:
+            if errors:
+                raise errors[0]
+            if fingerprints is None:
+                columns = sorted(row)
+                fingerprints = {k: (r["id"], _row_fingerprint(r, columns)) for k, r in existing.items()}
+                existing = None
+            k = row[key]
+            old = fingerprints.get(k)
+            if old is None:
+                state = "inserted"
+            elif old[1] != _row_fingerprint(row, columns) or status.get(k) == "updated":
+                state = "updated"
+            else:
+                state = "unchanged"
+            if k in status:
+                if state != "unchanged":
+                    late[k] = row
+            elif state != "unchanged":
+                batch.append(row)
+                if len(batch) >= SYNC_BATCH_SIZE:
+                    work.put(batch)
+                    batch = []
+            status[k] = state
+        if batch:
+            work.put(batch)
+    finally:
+        for _ in threads:
+            work.put(None)
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+    if fingerprints is None:
+        return {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    late_rows = list(late.values())
+    for i in range(0, len(late_rows), SYNC_BATCH_SIZE):
+        sb.table(table_name).upsert(late_rows[i:i + SYNC_BATCH_SIZE], on_conflict=key).execute()
+    stale.extend(row_id for k, (row_id, _) in fingerprints.items() if k not in status)
+    for i in range(0, len(stale), SYNC_BATCH_SIZE):
+        sb.table(table_name).delete().in_("id", stale[i:i + SYNC_BATCH_SIZE]).execute()
+
+    counts = {"inserted": 0, "updated": 0, "deleted": len(stale), "unchanged": 0}
+    for state in status.values():
+        counts[state] += 1
+    return counts
+
+
+def _table_changed(written):
+    return bool(written["inserted"] or written["updated"] or written["deleted"])
 
 # ─── Logic: Faculty List (Course Schedule) ───────────────────────────
 
-def _do_parse_faculty(file_path: str) -> dict:
+def _refresh_capacities(sb, table_name, pdf_bytes):
+    """
+    Capacity-only refresh of a re-uploaded faculty list (course_parser.read_capacities).
+    When the table holds exactly the same sections with the same session
+    times, faculty and rooms, only the changed capacities are written
+    (batched upserts on doc_id) and the write counts are returned; None
+    otherwise (timetable, faculty or room changed, empty table, pypdf
+    missing), in which case the caller does the full parse.
+    """
+    # The table first: on a first upload there is nothing to refresh, so skip the pypdf pass
+    try:
+        existing = _fetch_table_rows(sb, table_name)
+    except Exception as e:
+        logging.info(f"No capacity refresh for {table_name}: {e}")
+        return None
+    if not existing:
+        return None
+    fresh = course_parser.read_capacities(io.BytesIO(pdf_bytes))
+    if not fresh or len(existing) != len(fresh):
+        return None
+
+    changed = []
+    for row in existing:
+        entry = fresh.get(row.get("doc_id"))
+        if entry is None or course_parser.timetable_signature(row.get("sessions") or []) != entry[1]:
+            return None
+        if row.get("capacity") != entry[0]:
+            changed.append({"doc_id": row["doc_id"], "capacity": entry[0]})
+
+    for i in range(0, len(changed), SYNC_BATCH_SIZE):
+        sb.table(table_name).upsert(changed[i:i + SYNC_BATCH_SIZE], on_conflict="doc_id").execute()
+    return {"inserted": 0, "updated": len(changed), "deleted": 0, "unchanged": len(existing) - len(changed)}
+
+
+def _do_parse_faculty(file_path: str, force: bool = False) -> dict:
     sem_code, table_sem_code, pretty_sem, filename, is_dept = _get_semester_from_path(file_path)
     if not sem_code: return {"error": f"Semester not found in filename: {file_path}"}
     
@@ -398,36 +1689,59 @@ def _do_parse_faculty(file_path: str) -> dict:
 
     try:
         res = sb.storage.from_("academic_documents").download(file_path)
+        cache_key, digest = _parse_cache_key(file_path, table_sem_code), hashlib.sha256(res).hexdigest()
+        cached = None if force else _parse_cache_lookup(sb, cache_key, digest, course_parser.PARSER_VERSION)
+        if cached:
+            return {**cached, "cached": True}
+
+        # Re-publish with only seat counts changed: update capacities, skip the full parse
+        written = None if force else _refresh_capacities(sb, table_name, res)
+        if written is not None:
+            if _table_changed(written):
+                _bump_course_data_version(sb, table_name)
+            summary = {"status": "ok", "semester": pretty_sem, "table": table_name,
+                       "count": written["updated"] + written["unchanged"], "refresh": "capacity"}
+            _parse_cache_store(sb, cache_key, digest, course_parser.PARSER_VERSION, summary)
+            return {**summary, "written": written}
+
         pdf_bytes = io.BytesIO(res)
         
         meta_res = sb.table("course_metadata").select("code, name, credits, credit_val").execute()
         course_titles = { (r.get("code") or "").upper().replace(" ", ""): r for r in (meta_res.data or []) }
         
-        courses = course_parser.parse_course_pdf(pdf_bytes, sem_code, course_titles=course_titles)
-        if not courses: return {"status": "warning", "message": "No courses found."}
-        
         # Create table if it doesn't exist (idempotent RPC)
         sb.rpc("create_course_table", {"p_semester_code": table_sem_code.lower()}).execute()
-        # Clear ALL existing data (table is per-semester, no filter needed)
-        sb.table(table_name).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
-        
-        for i in range(0, len(courses), 100):
-            sb.table(table_name).insert(courses[i:i+100]).execute()
+        # Stream complete sections from the parser into concurrent upserts of
+        # the ones that changed (doc_id is unique per table)
+        courses = course_parser.iter_course_rows(pdf_bytes, sem_code, course_titles=course_titles, workers=PARSE_WORKERS)
+        written = _sync_table_stream(sb, table_name, courses, key="doc_id")
+        count = written["inserted"] + written["updated"] + written["unchanged"]
+        if not count: return {"status": "warning", "message": "No courses found."}
+
+        # Cached schedule results for this table are stale now
+        if _table_changed(written):
+            _bump_course_data_version(sb, table_name)
             
-        return {"status": "ok", "semester": pretty_sem, "table": table_name, "count": len(courses)}
+        summary = {"status": "ok", "semester": pretty_sem, "table": table_name, "count": count}
+        _parse_cache_store(sb, cache_key, digest, course_parser.PARSER_VERSION, summary)
+        return {**summary, "written": written}
     except Exception as e:
         logging.exception("parse_faculty failed")
         return {"error": str(e)}
 
 # ─── Logic: Academic Calendar ────────────────────────────────────────
 
-def _do_parse_calendar(file_path: str) -> dict:
+def _do_parse_calendar(file_path: str, force: bool = False) -> dict:
     sem_code, table_sem_code, pretty_sem, filename, is_dept = _get_semester_from_path(file_path)
     # Note: Calendar usually contains semester IN content, but we use filename as backup
     
     sb = _get_supabase()
     try:
         res = sb.storage.from_("academic_documents").download(file_path)
+        cache_key, digest = _parse_cache_key(file_path, table_sem_code or filename), hashlib.sha256(res).hexdigest()
+        cached = None if force else _parse_cache_lookup(sb, cache_key, digest, calendar_parser.PARSER_VERSION)
+        if cached:
+            return {**cached, "cached": True}
         pdf_bytes = io.BytesIO(res)
         
         parsed = calendar_parser.parse_calendar_pdf(pdf_bytes, filename=filename)
@@ -447,23 +1761,22 @@ def _do_parse_calendar(file_path: str) -> dict:
         table_name = f"calendar_{table_sem_code.lower()}"
         
         sb.rpc("create_calendar_table", {"p_semester_code": table_sem_code.lower()}).execute()
-        # Clear ALL rows in the table (table is per-semester, so no filter needed)
-        # Previous bug: delete().eq("semester", "Spring2026") missed rows stored as "Spring 2026"
-        sb.table(table_name).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
         
         # Normalize semester field in events to use pretty format consistently
         for evt in events:
             evt["semester"] = pretty_sem
         
-        if events:
-            for i in range(0, len(events), 100):
-                sb.table(table_name).insert(events[i:i+100]).execute()
+        # Diff against ALL rows in the table (table is per-semester, so no filter needed):
+        # rows stored under another spelling of the semester are replaced too
+        written = _sync_table(sb, table_name, events)
                 
         # Handle Config Updates (Shared with Phase 1 logic)
         # For departmental calendars, we update specialized active_semester record (ID 2)
         config_updates = _update_semester_config(sb, detected_sem, metadata, events=events, is_dept=is_dept)
         
-        return {"status": "ok", "semester": pretty_sem, "table": table_name, "count": len(events), "config_updates": config_updates}
+        summary = {"status": "ok", "semester": pretty_sem, "table": table_name, "count": len(events), "config_updates": config_updates}
+        _parse_cache_store(sb, cache_key, digest, calendar_parser.PARSER_VERSION, summary)
+        return {**summary, "written": written}
     except Exception as e:
         logging.exception("_do_parse_calendar failed")
         return {"error": str(e)}
@@ -587,7 +1900,7 @@ def _update_semester_config(sb, detected_semester, metadata, events=None, is_dep
 
 # ─── Logic: Exam Schedule ───────────────────────────────────────────
 
-def _do_parse_exam(file_path: str) -> dict:
+def _do_parse_exam(file_path: str, force: bool = False) -> dict:
     sem_code, table_sem_code, pretty_sem, filename, is_dept = _get_semester_from_path(file_path)
     if not sem_code: return {"error": f"Semester not found in filename: {file_path}"}
     
@@ -596,6 +1909,10 @@ def _do_parse_exam(file_path: str) -> dict:
 
     try:
         res = sb.storage.from_("academic_documents").download(file_path)
+        cache_key, digest = _parse_cache_key(file_path, table_sem_code), hashlib.sha256(res).hexdigest()
+        cached = None if force else _parse_cache_lookup(sb, cache_key, digest, exam_parser.PARSER_VERSION)
+        if cached:
+            return {**cached, "cached": True}
         pdf_bytes = io.BytesIO(res)
         
         exams = exam_parser.parse_exam_pdf(pdf_bytes, sem_code)
@@ -603,11 +1920,8 @@ def _do_parse_exam(file_path: str) -> dict:
         
         # Create table if it doesn't exist (idempotent RPC)
         sb.rpc("create_exam_table", {"p_semester_code": table_sem_code.lower()}).execute()
-        # Clear ALL existing data (table is per-semester, no filter needed)
-        sb.table(table_name).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
-        
-        for i in range(0, len(exams), 100):
-            sb.table(table_name).insert(exams[i:i+100]).execute()
+        # Write only the difference to the existing rows (no natural key: matched by content)
+        written = _sync_table(sb, table_name, exams)
             
         # [NEW] Trigger the Supabase Edge Function to match and distribute exam dates to all user profiles
         try:
@@ -636,14 +1950,16 @@ def _do_parse_exam(file_path: str) -> dict:
         except Exception as e:
             logging.error(f"Failed to prepare Edge Function invocation: {str(e)}")
             
-        return {"status": "ok", "semester": pretty_sem, "table": table_name, "count": len(exams)}
+        summary = {"status": "ok", "semester": pretty_sem, "table": table_name, "count": len(exams)}
+        _parse_cache_store(sb, cache_key, digest, exam_parser.PARSER_VERSION, summary)
+        return {**summary, "written": written}
     except Exception as e:
         logging.exception("_do_parse_exam failed")
         return {"error": str(e)}
 
 # ─── Logic: Advising Schedule ────────────────────────────────────────
 
-def _do_parse_advising(file_path: str) -> dict:
+def _do_parse_advising(file_path: str, force: bool = False) -> dict:
     sem_code, table_sem_code, pretty_sem, filename, is_dept = _get_semester_from_path(file_path)
     if not sem_code: return {"error": f"Semester not found in filename: {file_path}"}
     
@@ -652,6 +1968,10 @@ def _do_parse_advising(file_path: str) -> dict:
 
     try:
         res = sb.storage.from_("academic_documents").download(file_path)
+        cache_key, digest = _parse_cache_key(file_path, table_sem_code), hashlib.sha256(res).hexdigest()
+        cached = None if force else _parse_cache_lookup(sb, cache_key, digest, advising_parser.PARSER_VERSION)
+        if cached:
+            return {**cached, "cached": True}
         
         if filename.lower().endswith(".eml"):
             slots = advising_parser.parse_advising_eml(res, sem_code)
@@ -662,11 +1982,8 @@ def _do_parse_advising(file_path: str) -> dict:
         
         # Create table if it doesn't exist (idempotent RPC)
         sb.rpc("create_advising_table", {"p_semester_code": table_sem_code.lower()}).execute()
-        # Clear ALL existing data (table is per-semester, no filter needed)
-        sb.table(table_name).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
-        
-        for i in range(0, len(slots), 100):
-            sb.table(table_name).insert(slots[i:i+100]).execute()
+        # Write only the difference to the existing rows (no natural key: matched by content)
+        written = _sync_table(sb, table_name, slots)
             
         # [NEW] Trigger the Supabase Edge Function to match and assign advising slots to user profiles
         try:
@@ -695,7 +2012,9 @@ def _do_parse_advising(file_path: str) -> dict:
         except Exception as e:
             logging.error(f"Failed to prepare match-advising invocation: {str(e)}")
             
-        return {"status": "ok", "semester": pretty_sem, "table": table_name, "count": len(slots)}
+        summary = {"status": "ok", "semester": pretty_sem, "table": table_name, "count": len(slots)}
+        _parse_cache_store(sb, cache_key, digest, advising_parser.PARSER_VERSION, summary)
+        return {**summary, "written": written}
     except Exception as e:
         logging.exception("_do_parse_advising failed")
         return {"error": str(e)}
@@ -3,6 +3,8 @@ from email import policy
 import re
 import logging
 
+PARSER_VERSION = "1"
+
 def parse_advising_eml(eml_bytes, semester_code):
     """
     Parses EML content (bytes) and returns a list of advising slot dictionaries.
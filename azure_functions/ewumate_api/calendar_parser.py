@@ -3,6 +3,8 @@ import hashlib
 import pdfplumber
 from datetime import datetime
 
+PARSER_VERSION = "1"
+
 def parse_calendar_pdf(pdf_file, filename=None, debug=False):
     events = []
     metadata = {
@@ -1,8 +1,21 @@
+import io
+import math
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import pdfplumber
 import logging
 
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+from . import schedule_solver
+
+PARSER_VERSION = "1"
+
 def parse_time_to_minutes(time_str):
     """Parse time string like '08:30 AM' to minutes from midnight."""
     try:
@@ -47,205 +60,364 @@ def _parse_credits(val):
     except:
         return 0.0
 
-def parse_course_pdf(pdf_file, semester_id, course_titles=None):
+def add_timing_fields(course):
+    """
+    Precomputed timing for the schedule generator: startMinutes, endMinutes
+    (None if unparseable) and dayMask (bit per day, Sunday first) on every
+    session.
+    """
+    for sess in course.get("sessions") or []:
+        sess.pop("dayMask", None)  # recompute from the strings
+        sess["startMinutes"], sess["endMinutes"], sess["dayMask"] = schedule_solver.session_timing(sess)
+    return course
+
+# Regex Patterns
+# Matches course codes like CSE101, ENG101 (2-4 letters, 3-4 digits, optional suffix)
+code_pattern = re.compile(r"^[A-Z]{2,4}\d{3,4}[A-Z]?$")
+# Matches time ranges like 08:30 AM - 10:00 AM
+time_pattern = re.compile(r"(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)\s*-\s*\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))", re.IGNORECASE)
+# Matches capacity like 30/40 or 0/0, allowing spaces
+capacity_token_pattern = re.compile(r"^(\d+)\s*/\s*(\d+)$")
+# Unmapped glyphs: pdfplumber writes "(cid:13)" where pypdf yields a stray non-ASCII character
+unmapped_glyph_pattern = re.compile(r"\(cid:\d+\)|[^\x20-\x7e]")
+
+def parse_schedule_line(line):
+    """
+    One line of the faculty list -> (code, section, faculty, capacity,
+    startTime, endTime, day_str, room), or None for lines that are not a
+    class session.
+    """
+    # 1. Identify Time Range to split the line
+    time_match = time_pattern.search(line)
+
+    code, section, faculty, capacity = "", "", "", "0/0"
+    startTime, endTime, day_str, room = "", "", "", ""
+
+    if time_match:
+        full_time = time_match.group(1)
+        start_idx, end_idx = time_match.start(), time_match.end()
+
+        pre_time_text = line[:start_idx].strip()
+        post_time_text = line[end_idx:].strip() # Room is usually after time
+
+        # Parse Time
+        time_parts = full_time.split('-')
+        if len(time_parts) == 2:
+            startTime = time_parts[0].strip().upper()
+            endTime = time_parts[1].strip().upper()
+
+        # Tokenize the left side: CODE SECTION FACULTY... CAPACITY DAY...
+        tokens = pre_time_text.split()
+        if not tokens: return None
+
+        # A. Extract Days from the END of the left side
+        day_tokens = []
+        while tokens:
+            curr = tokens[-1].replace(',', '').upper()
+            # specific check for day abbreviations
+            if len(curr) <= 3 and all(c in 'SMTWRFA' for c in curr):
+                day_tokens.insert(0, curr)
+                tokens.pop()
+            else:
+                break
+        day_str = " ".join(day_tokens) if day_tokens else "TBA"
+
+        if not tokens: return None # Should have code/section left
+
+        # B. Extract Code and Section from the START
+        code = tokens[0].upper()
+        current_idx = 1
+
+        # Fix for Split Codes (e.g., "CSE 101" -> "CSE101")
+        if len(tokens) > 1 and code.isalpha() and tokens[1][0].isdigit():
+             code = code + tokens[1]
+             current_idx = 2
+
+        if len(tokens) > current_idx:
+            section = tokens[current_idx]
+            # Verify section is short (usually 1-2 chars) to avoid grabbing Faculty name part
+            # But sometimes section is just '1'. 
+            middle_tokens = tokens[current_idx+1:]
+        else:
+            section = ""
+            middle_tokens = []
+
+        # C. Extract Capacity and Faculty from the MIDDLE
+        # Search specifically for the capacity token (e.g. "30/40")
+        capacity_idx = -1
+        for i, tok in enumerate(middle_tokens):
+            if capacity_token_pattern.match(tok):
+                capacity_idx = i
+                capacity = tok
+                break
+
+        if capacity_idx != -1:
+            # Faculty is everything before capacity
+            faculty_tokens = middle_tokens[:capacity_idx]
+            faculty = " ".join(faculty_tokens)
+        else:
+            # Fallback: Regex search on the joined string if token split failed
+            # e.g. "Dr.Smith30/40"
+            joined_middle = " ".join(middle_tokens)
+            cap_search = re.search(r"(\d+\s*/\s*\d+)", joined_middle)
+            if cap_search:
+                capacity = cap_search.group(1)
+                faculty = joined_middle.replace(capacity, "").strip() # This is the fallback
+            else:
+                faculty = joined_middle
+
+        # Extract Room from right side
+        room = post_time_text.strip()
+        if not room: room = "TBA"
+
+    else:
+        # Line without time (e.g. header or just code info? or online?)
+        # Handling "Online" cases if relevant
+        if "Online" in line:
+            tokens = line.split()
+            if len(tokens) >= 2:
+                code = tokens[0].upper()
+                section = tokens[1]
+                room = "Online"
+                day_str = "TBA"
+        else:
+            return None # Skip malformed lines
+
+    return code, section, faculty, capacity, startTime, endTime, day_str, room
+
+def _signature_text(val):
+    return unmapped_glyph_pattern.sub("", val or "").strip()
+
+def timetable_signature(sessions):
+    """
+    Sorted (start, end, day mask, faculty, room) of a section's sessions:
+    equal signatures mean an unchanged timetable and assignment.
+    """
+    entries = (
+        schedule_solver.session_timing(sess) + (_signature_text(sess.get("faculty")), _signature_text(sess.get("room")))
+        for sess in sessions
+    )
+    return tuple(sorted(entries, key=lambda t: tuple(-1 if v is None else v for v in t[:3]) + t[3:]))
+
+def read_capacities(pdf_file):
+    """
+    Fast pass for capacity refreshes: doc_id -> (capacity, timetable
+    signature including faculty and room) of every section in the faculty
+    list. Reads the same lines as parse_course_pdf but extracts the text
+    with pypdf, which is several times faster than pdfplumber, and builds
+    no course objects. None if pypdf is not installed.
+    """
+    if PdfReader is None:
+        return None
+    sections = {}
+    for page in PdfReader(pdf_file).pages:
+        pending = None
+        for line in (page.extract_text() or "").split('\n'):
+            # pypdf breaks rows with a wrapped cell (e.g. a long faculty name)
+            # into several lines; rejoin a cut-off row (code but no capacity or
+            # time yet) with the line holding the capacity and time range. The
+            # wrapped overflow in between is dropped, as pdfplumber puts it on a
+            # line of its own that parse_course_pdf skips.
+            tokens = line.split()
+            has_slot = time_pattern.search(line) or any(capacity_token_pattern.match(tok) for tok in tokens)
+            if pending is not None:
+                if not has_slot:
+                    continue
+                line, pending = f"{pending} {line}", None
+            elif (tokens and code_pattern.match(tokens[0].upper()) and "Online" not in line
+                    and not has_slot and len(tokens) < 12):
+                pending = line
+                continue
+            parsed = parse_schedule_line(line)
+            if parsed is None:
+                continue
+            code, section, faculty, capacity, startTime, endTime, day_str, room = parsed
+            # Capacity of the first line of a section, as in parse_course_pdf
+            entry = sections.setdefault(f"course_{code}_{section}", (capacity, []))
+            entry[1].append({"startTime": startTime, "endTime": endTime, "day": day_str,
+                             "faculty": faculty, "room": room})
+    return {doc_id: (capacity, timetable_signature(sessions)) for doc_id, (capacity, sessions) in sections.items()}
+
+def _add_session(course_map, parsed, semester_id, course_titles):
+    """Adds one parse_schedule_line result to course_map (code_section -> course row)."""
+    code, section, faculty, capacity, startTime, endTime, day_str, room = parsed
+
+    # Build Session Object
+    session_type = "Theory"
+    if startTime and endTime:
+        session_type = detect_session_type(startTime, endTime)
+
+    session = {
+        "type": session_type, "day": day_str, "startTime": startTime,
+        "endTime": endTime, "room": room, "faculty": faculty
+    }
+
+    # Add to Map
+    # Use a consistent ID generation
+    course_key = _course_key(code, section)
+
+    if course_key not in course_map:
+        course_name, credits_val = "", 0.0
+        # Metadata lookup (titles/credits)
+        if course_titles:
+               key_to_use = None
+               if code in course_titles:
+                   key_to_use = code
+               else:
+                   # Try spacing out code: CSE101 -> CSE 101 or CSE 101 -> CSE101
+                   match_code = re.match(r"([A-Z]+)(\d+.*)", code)
+                   if match_code:
+                       prefix = match_code.group(1)
+                       digits = match_code.group(2)
+
+                       # 1. Spaced Check
+                       spaced_code = f"{prefix} {digits}"
+                       if spaced_code in course_titles:
+                           key_to_use = spaced_code
+
+                       # 2. 4-Digit Fallback (e.g. ENG7101 -> ENG101)
+                       # Checks if we have 4 digits, tries removing the first one.
+                       elif len(digits) == 4 and digits.isdigit():
+                            fallback_digits = digits[1:] # "7101" -> "101"
+                            fallback_code = f"{prefix}{fallback_digits}"
+                            fallback_spaced = f"{prefix} {fallback_digits}"
+
+                            if fallback_code in course_titles:
+                                key_to_use = fallback_code
+                            elif fallback_spaced in course_titles:
+                                key_to_use = fallback_spaced
+
+               if key_to_use:
+                   meta_data = course_titles.get(key_to_use, {})
+                   # Robust name lookup: 'name', 'title', 'courseName', 'courseTitle'
+                   course_name = meta_data.get("name") or meta_data.get("title") or meta_data.get("courseName") or meta_data.get("courseTitle") or ""
+                   if "creditVal" in meta_data:
+                       try:
+                           credits_val = float(meta_data["creditVal"])
+                       except:
+                           credits_val = _parse_credits(meta_data.get("credits", "0"))
+                   else:
+                       credits_val = _parse_credits(meta_data.get("credits", "0"))
+
+        course_map[course_key] = {
+            "doc_id": f"course_{code}_{section}", # Matches schema check: doc_id
+            "code": code, 
+            "course_name": course_name, # Matches schema check: course_name
+            "section": section, 
+            "credits": credits_val, # Matches schema check: credits (int/float?)
+            "capacity": capacity,
+            "semester": semester_id, 
+            "type": "COURSE", 
+            "sessions": [],
+            "faculty": faculty # Base faculty (will be overwritten if multiple sessions have different faculty? Usually same)
+        }
+
+        # Note: Schema inspection showed 'faculty' column on the course table too.
+        # It also showed 'sessions' jsonb column.
+
+    # Add session
+    course_map[course_key]["sessions"].append(session)
+    # Update faculty if empty (sometimes first session doesn't have it?)
+    if not course_map[course_key]["faculty"] and faculty:
+         course_map[course_key]["faculty"] = faculty
+
+def _course_key(code, section):
+    return f"{code}_{section}".replace(" ", "")
+
+def _lines_of(page):
+    parsed_lines = []
+    text = page.extract_text()
+    if text:
+        for line in text.split('\n'):
+            parsed = parse_schedule_line(line)
+            if parsed is not None:
+                parsed_lines.append(parsed)
+    return parsed_lines
+
+def _page_lines(pdf_bytes, start, stop):
+    """
+    Pool task: parse_schedule_line results of pages [start, stop), one
+    list per page. Each worker opens its own copy of the document.
+    """
+    pages = []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages[start:stop]:
+            pages.append(_lines_of(page))
+            page.flush_cache()
+    return pages
+
+def _iter_page_lines(pdf_file, workers=0):
+    """
+    parse_schedule_line results, one list per page, in page order. With
+    workers > 1, contiguous page ranges are extracted and tokenized in a
+    process pool (pdfplumber is CPU-bound) and yielded in page order, so
+    the merged result is the same as the sequential one.
+    """
+    if workers <= 1:
+        with pdfplumber.open(pdf_file) as pdf:
+            for page in pdf.pages:
+                yield _lines_of(page)
+                page.flush_cache()
+        return
+
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        pdf_file.seek(0)
+        pdf_bytes = pdf_file.read()
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page_count = len(pdf.pages)
+    # A few ranges per worker evens out pages of different density
+    step = max(1, math.ceil(page_count / (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_page_lines, pdf_bytes, start, min(start + step, page_count))
+                   for start in range(0, page_count, step)]
+        for fut in futures:
+            yield from fut.result()
+
+def iter_course_rows(pdf_file, semester_id, course_titles=None, workers=0):
+    """
+    Streaming form of parse_course_pdf: yields finished course rows (with
+    timing fields) while later pages are still being parsed, so callers
+    can write them as they go. A section's lines are consecutive in the
+    faculty list, so a row is yielded once the next section starts (on the
+    same page or a later one) or the input ends, never with part of its
+    sessions. A section listed again after it was yielded is yielded once
+    more, as a new dict with all its sessions; consumers keyed by doc_id
+    keep the last one.
+    """
+    course_map = {}
+    current = None  # key of the section being read, not yet yielded
+    for page in _iter_page_lines(pdf_file, workers):
+        for parsed in page:
+            key = _course_key(parsed[0], parsed[1])
+            if key != current:
+                if current is not None:
+                    yield add_timing_fields(course_map[current])
+                if key in course_map:
+                    # Listed again after it was yielded: continue on a copy
+                    course = course_map[key]
+                    course_map[key] = {**course, "sessions": [dict(sess) for sess in course["sessions"]]}
+                current = key
+            _add_session(course_map, parsed, semester_id, course_titles)
+    if current is not None:
+        yield add_timing_fields(course_map[current])
+
+def parse_course_pdf(pdf_file, semester_id, course_titles=None, workers=0):
     """
     Parses course PDF.
     pdf_file: file-like object (bytes) or path.
     semester_id: str ("Spring2026")
     course_titles: dict (code -> metadata) for looking up names/credits.
+    workers: > 1 extracts pages in that many processes (same output).
     """
     course_map = {}
     
-    # Regex Patterns
-    # Matches course codes like CSE101, ENG101 (2-4 letters, 3-4 digits, optional suffix)
-    code_pattern = re.compile(r"^[A-Z]{2,4}\d{3,4}[A-Z]?$")
-    # Matches time ranges like 08:30 AM - 10:00 AM
-    time_pattern = re.compile(r"(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)\s*-\s*\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))", re.IGNORECASE)
-    # Matches capacity like 30/40 or 0/0, allowing spaces
-    capacity_token_pattern = re.compile(r"^(\d+)\s*/\s*(\d+)$")
-
     try:
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text: continue
-                
-                lines = text.split('\n')
-                for line in lines:
-                    # 1. Identify Time Range to split the line
-                    time_match = time_pattern.search(line)
-                    
-                    code, section, faculty, capacity = "", "", "", "0/0"
-                    startTime, endTime, day_str, room = "", "", "", ""
-                    
-                    if time_match:
-                        full_time = time_match.group(1)
-                        start_idx, end_idx = time_match.start(), time_match.end()
-                        
-                        pre_time_text = line[:start_idx].strip()
-                        post_time_text = line[end_idx:].strip() # Room is usually after time
-                        
-                        # Parse Time
-                        time_parts = full_time.split('-')
-                        if len(time_parts) == 2:
-                            startTime = time_parts[0].strip().upper()
-                            endTime = time_parts[1].strip().upper()
-                            
-                        # Tokenize the left side: CODE SECTION FACULTY... CAPACITY DAY...
-                        tokens = pre_time_text.split()
-                        if not tokens: continue
-
-                        # A. Extract Days from the END of the left side
-                        day_tokens = []
-                        while tokens:
-                            curr = tokens[-1].replace(',', '').upper()
-                            # specific check for day abbreviations
-                            if len(curr) <= 3 and all(c in 'SMTWRFA' for c in curr):
-                                day_tokens.insert(0, curr)
-                                tokens.pop()
-                            else:
-                                break
-                        day_str = " ".join(day_tokens) if day_tokens else "TBA"
-
-                        if not tokens: continue # Should have code/section left
-
-                        # B. Extract Code and Section from the START
-                        code = tokens[0].upper()
-                        current_idx = 1
-                        
-                        # Fix for Split Codes (e.g., "CSE 101" -> "CSE101")
-                        if len(tokens) > 1 and code.isalpha() and tokens[1][0].isdigit():
-                             code = code + tokens[1]
-                             current_idx = 2
-
-                        if len(tokens) > current_idx:
-                            section = tokens[current_idx]
-                            # Verify section is short (usually 1-2 chars) to avoid grabbing Faculty name part
-                            # But sometimes section is just '1'. 
-                            middle_tokens = tokens[current_idx+1:]
-                        else:
-                            section = ""
-                            middle_tokens = []
-
-                        # C. Extract Capacity and Faculty from the MIDDLE
-                        # Search specifically for the capacity token (e.g. "30/40")
-                        capacity_idx = -1
-                        for i, tok in enumerate(middle_tokens):
-                            if capacity_token_pattern.match(tok):
-                                capacity_idx = i
-                                capacity = tok
-                                break
-                        
-                        if capacity_idx != -1:
-                            # Faculty is everything before capacity
-                            faculty_tokens = middle_tokens[:capacity_idx]
-                            faculty = " ".join(faculty_tokens)
-                        else:
-                            # Fallback: Regex search on the joined string if token split failed
-                            # e.g. "Dr.Smith30/40"
-                            joined_middle = " ".join(middle_tokens)
-                            cap_search = re.search(r"(\d+\s*/\s*\d+)", joined_middle)
-                            if cap_search:
-                                capacity = cap_search.group(1)
-                                faculty = joined_middle.replace(capacity, "").strip() # This is the fallback
-                            else:
-                                faculty = joined_middle
-
-                        # Extract Room from right side
-                        room = post_time_text.strip()
-                        if not room: room = "TBA"
-
-                    else:
-                        # Line without time (e.g. header or just code info? or online?)
-                        # Handling "Online" cases if relevant
-                        if "Online" in line:
-                            tokens = line.split()
-                            if len(tokens) >= 2:
-                                code = tokens[0].upper()
-                                section = tokens[1]
-                                room = "Online"
-                                day_str = "TBA"
-                        else:
-                            continue # Skip malformed lines
-
-                    # Build Session Object
-                    session_type = "Theory"
-                    if startTime and endTime:
-                        session_type = detect_session_type(startTime, endTime)
-
-                    session = {
-                        "type": session_type, "day": day_str, "startTime": startTime,
-                        "endTime": endTime, "room": room, "faculty": faculty
-                    }
-
-                    # Add to Map
-                    # Use a consistent ID generation
-                    course_key = f"{code}_{section}".replace(" ", "")
-                    
-                    if course_key not in course_map:
-                        course_name, credits_val = "", 0.0
-                        # Metadata lookup (titles/credits)
-                        if course_titles:
-                               key_to_use = None
-                               if code in course_titles:
-                                   key_to_use = code
-                               else:
-                                   # Try spacing out code: CSE101 -> CSE 101 or CSE 101 -> CSE101
-                                   match_code = re.match(r"([A-Z]+)(\d+.*)", code)
-                                   if match_code:
-                                       prefix = match_code.group(1)
-                                       digits = match_code.group(2)
-                                       
-                                       # 1. Spaced Check
-                                       spaced_code = f"{prefix} {digits}"
-                                       if spaced_code in course_titles:
-                                           key_to_use = spaced_code
-                                       
-                                       # 2. 4-Digit Fallback (e.g. ENG7101 -> ENG101)
-                                       # Checks if we have 4 digits, tries removing the first one.
-                                       elif len(digits) == 4 and digits.isdigit():
-                                            fallback_digits = digits[1:] # "7101" -> "101"
-                                            fallback_code = f"{prefix}{fallback_digits}"
-                                            fallback_spaced = f"{prefix} {fallback_digits}"
-                                            
-                                            if fallback_code in course_titles:
-                                                key_to_use = fallback_code
-                                            elif fallback_spaced in course_titles:
-                                                key_to_use = fallback_spaced
-                               
-                               if key_to_use:
-                                   meta_data = course_titles.get(key_to_use, {})
-                                   # Robust name lookup: 'name', 'title', 'courseName', 'courseTitle'
-                                   course_name = meta_data.get("name") or meta_data.get("title") or meta_data.get("courseName") or meta_data.get("courseTitle") or ""
-                                   if "creditVal" in meta_data:
-                                       try:
-                                           credits_val = float(meta_data["creditVal"])
-                                       except:
-                                           credits_val = _parse_credits(meta_data.get("credits", "0"))
-                                   else:
-                                       credits_val = _parse_credits(meta_data.get("credits", "0"))
-                                   
-                        course_map[course_key] = {
-                            "doc_id": f"course_{code}_{section}", # Matches schema check: doc_id
-                            "code": code, 
-                            "course_name": course_name, # Matches schema check: course_name
-                            "section": section, 
-                            "credits": credits_val, # Matches schema check: credits (int/float?)
-                            "capacity": capacity,
-                            "semester": semester_id, 
-                            "type": "COURSE", 
-                            "sessions": [],
-                            "faculty": faculty # Base faculty (will be overwritten if multiple sessions have different faculty? Usually same)
-                        }
-                        
-                        # Note: Schema inspection showed 'faculty' column on the course table too.
-                        # It also showed 'sessions' jsonb column.
-                    
-                    # Add session
-                    course_map[course_key]["sessions"].append(session)
-                    # Update faculty if empty (sometimes first session doesn't have it?)
-                    if not course_map[course_key]["faculty"] and faculty:
-                         course_map[course_key]["faculty"] = faculty
+        # Sections continuing on the next page (or range) merge into the same entry
+        for course in iter_course_rows(pdf_file, semester_id, course_titles, workers):
+            course_map[_course_key(course["code"], course["section"])] = course
 
     except Exception as e:
         logging.error(f"Error parsing PDF: {e}")
@@ -3,6 +3,8 @@ import pdfplumber
 import logging
 import io
 
+PARSER_VERSION = "1"
+
 def parse_exam_pdf(pdf_stream, semester_code):
     """
     Parses East West University Exam Schedule PDF.
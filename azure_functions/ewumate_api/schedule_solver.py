@@ -0,0 +1,889 @@
+"""
+Schedule solver primitives used by the generate_schedules endpoint.
+
+Every section is compiled once per request into a weekly occupancy bitmask:
+bit (day * 1440 + minute) is set when the section holds a class in that
+minute. Two sections clash exactly when their masks share a bit, so the
+backtracker's conflict check is a single integer AND. The rows themselves
+are wrapped in SectionModel objects for the duration of the solve.
+"""
+
+import heapq
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from functools import lru_cache
+
+MINUTES_PER_DAY = 24 * 60
+_DAY_SLICE = (1 << MINUTES_PER_DAY) - 1
+
+# Day letters as printed in the faculty list (Sunday .. Saturday)
+DAY_CHARS = "SMTWRFA"
+DAY_INDEX = {c: i for i, c in enumerate(DAY_CHARS)}
+DAY_NAME_TO_CHAR = {
+    "sunday": "S", "monday": "M", "tuesday": "T",
+    "wednesday": "W", "thursday": "R", "friday": "F", "saturday": "A",
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_time_to_minutes(time_str):
+    """'08:30 AM' / '08:30AM' / '13:10' -> minutes from midnight, None if unparseable (memoized: the faculty list uses few distinct times)."""
+    if not time_str:
+        return None
+    try:
+        t = time_str.strip().upper()
+        if t.endswith(("AM", "PM")) and not t[:-2].endswith(" "):
+            t = t[:-2] + " " + t[-2:]
+        if "AM" in t or "PM" in t:
+            dt = datetime.strptime(t, "%I:%M %p")
+        else:
+            dt = datetime.strptime(t, "%H:%M")
+        return dt.hour * 60 + dt.minute
+    except ValueError:
+        return None
+
+
+def day_bits(day_str):
+    """'MW' -> 7-bit mask with one bit per teaching day ('TBA' has none)."""
+    day_str = (day_str or "").upper()
+    if day_str.strip() == "TBA":
+        return 0
+    bits = 0
+    for c in day_str:
+        idx = DAY_INDEX.get(c)
+        if idx is not None:
+            bits |= 1 << idx
+    return bits
+
+
+def _window_mask(start, end, days=(1 << len(DAY_CHARS)) - 1):
+    """Minutes [start, end) on each day in the 7-bit `days` mask."""
+    if start >= end:
+        return 0
+    run = ((1 << (end - start)) - 1) << start
+    mask = 0
+    for idx in range(len(DAY_CHARS)):
+        if days & (1 << idx):
+            mask |= run << (idx * MINUTES_PER_DAY)
+    return mask
+
+
+def session_mask(day_str, start_time, end_time):
+    """Occupancy mask of a single session. Sessions without a valid time range occupy nothing."""
+    start = parse_time_to_minutes(start_time)
+    end = parse_time_to_minutes(end_time)
+    if start is None or end is None:
+        return 0
+    return _window_mask(start, end, day_bits(day_str))
+
+
+def session_timing(sess):
+    """
+    (start minutes, end minutes, 7-bit day mask) of a session, from the
+    startMinutes/endMinutes/dayMask fields course_parser stores when
+    present, else parsed from the time and day strings (camelCase or
+    snake_case keys). Minutes are None when unknown.
+    """
+    if "dayMask" in sess:
+        return sess.get("startMinutes"), sess.get("endMinutes"), sess["dayMask"]
+    return (
+        parse_time_to_minutes(sess.get("startTime") or sess.get("start_time")),
+        parse_time_to_minutes(sess.get("endTime") or sess.get("end_time")),
+        day_bits(sess.get("day", "")),
+    )
+
+
+def section_mask(section):
+    """OR of all session masks of a section, from its sessions' timing fields."""
+    mask = 0
+    for sess in section.get("sessions") or []:
+        start, end, days = session_timing(sess)
+        if start is not None and end is not None:
+            mask |= _window_mask(start, end, days)
+    return mask
+
+
+class SectionModel:
+    """
+    Solver-side view of one section row, built once per request so the
+    filters, penalties and searches read integers instead of the row's
+    session dicts: occupancy mask, 7-bit mask of the days it occupies,
+    7-bit mask of the days its sessions name (timed or not), faculty
+    initials and (start, end, day mask) per session. `row` is the
+    original dict, the only thing emitted schedules refer to.
+    """
+
+    __slots__ = ("row", "mask", "days", "named_days", "faculty", "timings")
+
+    def __init__(self, row):
+        self.row = row
+        self.timings = tuple(session_timing(sess) for sess in row.get("sessions") or [])
+        self.mask = section_mask(row)
+        self.days = occupied_days(self.mask)
+        named = 0
+        for _, _, days in self.timings:
+            named |= days
+        self.named_days = named
+        self.faculty = frozenset(section_faculty(row))
+
+
+def masks_conflict(mask1, mask2):
+    return (mask1 & mask2) != 0
+
+
+def iter_bits(bits):
+    """Indices of the set bits, lowest first."""
+    while bits:
+        low = bits & -bits
+        bits ^= low
+        yield low.bit_length() - 1
+
+
+def occupied_days(occupied):
+    """7-bit mask of the days with at least one class in an occupancy mask."""
+    days = 0
+    for d in range(len(DAY_CHARS)):
+        if (occupied >> (d * MINUTES_PER_DAY)) & _DAY_SLICE:
+            days |= 1 << d
+    return days
+
+
+def campus_days(occupied):
+    """Number of days with at least one class in an occupancy mask."""
+    return occupied_days(occupied).bit_count()
+
+
+def idle_minutes(occupied, days=None):
+    """
+    Total minutes between the first and last class of each day not spent
+    in class; `days` (see occupied_days), when known, skips the free days.
+    """
+    total = 0
+    for d in range(len(DAY_CHARS)) if days is None else iter_bits(days):
+        day = (occupied >> (d * MINUTES_PER_DAY)) & _DAY_SLICE
+        if day:
+            first = (day & -day).bit_length()
+            total += day.bit_length() - first + 1 - day.bit_count()
+    return total
+
+
+# ─── Pairwise compatibility bitsets ─────────────────────────────────
+
+def build_compatibility(groups):
+    """
+    groups: one list of section masks per course, in search order.
+
+    Sections are numbered consecutively across the groups. Returns
+    (course_bits, compat) where course_bits[k] has a bit for every section
+    of course k and compat[i] has bit j set when sections i and j belong to
+    different courses and do not clash.
+    """
+    masks = [m for group in groups for m in group]
+    course_bits = []
+    owner = []
+    offset = 0
+    for k, group in enumerate(groups):
+        course_bits.append(((1 << len(group)) - 1) << offset)
+        owner.extend([k] * len(group))
+        offset += len(group)
+
+    compat = [0] * len(masks)
+    for i in range(len(masks)):
+        mi, ki = masks[i], owner[i]
+        for j in range(i + 1, len(masks)):
+            if owner[j] != ki and not mi & masks[j]:
+                compat[i] |= 1 << j
+                compat[j] |= 1 << i
+    return course_bits, compat
+
+
+def prune_domains(course_bits, compat):
+    """
+    Arc consistency over the compatibility bitsets: drops every section
+    that clashes with all remaining sections of some other course, and
+    repeats until nothing changes. Returns the narrowed course_bits (an
+    emptied course means there is no valid schedule); compat is unchanged
+    since the searches always intersect it with the current domains.
+    """
+    domains = list(course_bits)
+    changed = True
+    while changed:
+        changed = False
+        for k, dom in enumerate(domains):
+            others = [d for j, d in enumerate(domains) if j != k]
+            keep = 0
+            for i in iter_bits(dom):
+                ci = compat[i]
+                if all(ci & d for d in others):
+                    keep |= 1 << i
+            if keep != dom:
+                domains[k] = keep
+                changed = True
+                if not keep:
+                    return domains
+    return domains
+
+
+# ─── Request filters ────────────────────────────────────────────────
+
+def _filter_days(days):
+    """["Friday", "M", ...] -> 7-bit day mask (full names or faculty-list letters)."""
+    bits = 0
+    for day in days or []:
+        day = str(day).strip()
+        char = DAY_NAME_TO_CHAR.get(day.lower()) or (day.upper() if len(day) == 1 else "")
+        bits |= day_bits(char)
+    return bits
+
+
+def _faculty_set(names):
+    return {str(f).strip().upper() for f in names or [] if str(f).strip()}
+
+
+def compile_filters(filters):
+    """
+    Compiles the `filters` request object once per request:
+      {
+        "exclude_days": ["Friday"],
+        "earliest_start": "09:00 AM",
+        "latest_end": "05:00 PM",
+        "blocked_windows": [{"day": "Monday", "start": "01:00 PM", "end": "02:30 PM"}],
+        "preferred_faculty": ["MAR"],
+        "exclude_faculty": ["ABC"],
+        "max_campus_days": 3
+      }
+    Time filters become one `forbidden` occupancy mask (a window without
+    "day" applies to every day), so a section passes them when its mask
+    does not intersect it. Preferred faculty narrows a course to their
+    sections only when it has any; max_campus_days is enforced during the
+    search (see DayLimit).
+    """
+    filters = filters or {}
+    forbidden = 0
+    earliest = parse_time_to_minutes(filters.get("earliest_start"))
+    if earliest is not None:
+        forbidden |= _window_mask(0, earliest)
+    latest = parse_time_to_minutes(filters.get("latest_end"))
+    if latest is not None:
+        forbidden |= _window_mask(latest, MINUTES_PER_DAY)
+    for window in filters.get("blocked_windows") or []:
+        start = parse_time_to_minutes(window.get("start"))
+        end = parse_time_to_minutes(window.get("end"))
+        if start is None or end is None:
+            raise ValueError(f"Invalid blocked window: {window}")
+        days = _filter_days([window["day"]]) if window.get("day") else (1 << len(DAY_CHARS)) - 1
+        forbidden |= _window_mask(start, end, days)
+    max_days = filters.get("max_campus_days")
+    return {
+        "forbidden": forbidden,
+        "excluded_days": _filter_days(filters.get("exclude_days")),
+        "preferred_faculty": _faculty_set(filters.get("preferred_faculty")),
+        "excluded_faculty": _faculty_set(filters.get("exclude_faculty")),
+        "max_days": int(max_days) if max_days not in (None, "") else None,
+    }
+
+
+def section_faculty(section):
+    """Upper-cased faculty initials of a section and its sessions."""
+    names = {(section.get("faculty") or "").strip().upper()}
+    names.update((sess.get("faculty") or "").strip().upper() for sess in section.get("sessions") or [])
+    names.discard("")
+    return names
+
+
+def filter_sections(models, compiled):
+    """Positions of the sections (SectionModel) of one course passing the compiled filters."""
+    forbidden = compiled["forbidden"]
+    excluded_days = compiled["excluded_days"]
+    excluded_faculty = compiled["excluded_faculty"]
+    max_days = compiled["max_days"]
+    keep = [
+        i for i, model in enumerate(models)
+        if not model.mask & forbidden
+        and not (excluded_days and model.named_days & excluded_days)
+        and not (excluded_faculty and model.faculty & excluded_faculty)
+        and not (max_days is not None and model.days.bit_count() > max_days)
+    ]
+    preferred = compiled["preferred_faculty"]
+    if preferred:
+        taught = [i for i in keep if models[i].faculty & preferred]
+        if taught:
+            keep = taught
+    return keep
+
+
+class DayLimit:
+    """
+    Maximum number of campus days, enforced by forward checking: after each
+    placement the remaining candidates are narrowed to the sections that
+    keep the days used within the limit. day_masks[i] is the 7-bit day mask
+    of flat index i (see occupied_days).
+    """
+
+    def __init__(self, day_masks, max_days):
+        self.day_masks = day_masks
+        self.max_days = max_days
+        self._fits = {}
+
+    def fits(self, days):
+        """Bitset of the indices that keep `days` within the limit."""
+        bits = self._fits.get(days)
+        if bits is None:
+            bits = 0
+            for i, d in enumerate(self.day_masks):
+                if (days | d).bit_count() <= self.max_days:
+                    bits |= 1 << i
+            self._fits[days] = bits
+        return bits
+
+    def narrow(self, days, i, allowed):
+        """(days, allowed) after choosing index i."""
+        days |= self.day_masks[i]
+        return days, allowed & self.fits(days)
+
+
+# ─── Search budget ──────────────────────────────────────────────────
+
+class BudgetExceeded(Exception):
+    """Raised inside a search when its SearchBudget runs out."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class SearchBudget:
+    """
+    Wall-clock and node budget plus a cooperative cancellation check for one
+    search. tick() is called once per search node and raises BudgetExceeded
+    ("time", "nodes" or "cancelled") once the budget is spent. The clock,
+    node limit and `cancelled` callback are only consulted every
+    `check_every` nodes, so the per-node cost is a counter increment and
+    the node limit may be overshot by up to that many nodes.
+    """
+
+    def __init__(self, seconds=None, nodes=None, cancelled=None, check_every=2048):
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.max_nodes = nodes or None
+        self.cancelled = cancelled
+        self.check_every = check_every
+        self.nodes = 0
+        self.reason = None
+        self._next_check = check_every
+
+    def remaining(self):
+        """(seconds, nodes) left, None where unlimited; seeds the budgets of pool tasks."""
+        seconds = None if self.deadline is None else self.deadline - time.monotonic()
+        nodes = None if not self.max_nodes else self.max_nodes - self.nodes
+        return seconds, nodes
+
+    def cap_nodes(self, nodes):
+        """Allows at most `nodes` more nodes from here (a tighter existing limit still applies)."""
+        cap = self.nodes + nodes
+        self.max_nodes = min(self.max_nodes, cap) if self.max_nodes else cap
+
+    def tick(self):
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._next_check = self.nodes + self.check_every
+            self.check()
+
+    def check(self):
+        if self.max_nodes and self.nodes >= self.max_nodes:
+            self.reason = "nodes"
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "time"
+        elif self.cancelled is not None and self.cancelled():
+            self.reason = "cancelled"
+        else:
+            return
+        raise BudgetExceeded(self.reason)
+
+
+def search_compatible(course_bits, compat, on_leaf, limit, budget=None, day_limit=None):
+    """
+    Depth-first search over the courses in order. The candidates for the
+    next course are its sections intersected with the compat sets of every
+    section chosen so far, so no pair is ever re-checked. Candidates are
+    visited lowest index first, which keeps the original section order.
+
+    on_leaf(indices) is called with a tuple of the flat section indices of
+    each complete schedule; returns the number of schedules found. A
+    SearchBudget is ticked once per node (see SearchBudget); a DayLimit
+    narrows the candidates after each placement.
+    """
+    n = len(course_bits)
+    found = 0
+    current = []
+
+    def bt(k, allowed, days):
+        nonlocal found
+        if found >= limit:
+            return
+        if budget:
+            budget.tick()
+        cand = course_bits[k] & allowed
+        if k == n - 1:
+            # Every remaining candidate completes a schedule
+            while cand and found < limit:
+                low = cand & -cand
+                cand ^= low
+                found += 1
+                on_leaf(tuple(current) + (low.bit_length() - 1,))
+            return
+        while cand:
+            low = cand & -cand
+            cand ^= low
+            i = low.bit_length() - 1
+            sub_days, sub = days, allowed & compat[i]
+            if day_limit:
+                sub_days, sub = day_limit.narrow(days, i, sub)
+            current.append(i)
+            bt(k + 1, sub, sub_days)
+            current.pop()
+            if found >= limit:
+                return
+
+    if not n:
+        on_leaf(())
+        return 1
+    bt(0, day_limit.fits(0) if day_limit else -1, 0)
+    return found
+
+
+def _pick_mrv(course_bits, allowed, remaining):
+    """
+    Most constrained remaining course: (course, domain, rest) with the
+    smallest domain (first on ties), or None when a domain is empty.
+    """
+    best, best_dom, best_size = -1, 0, 0
+    for k in remaining:
+        dom = course_bits[k] & allowed
+        if not dom:
+            return None  # wiped-out domain
+        size = dom.bit_count()
+        if best < 0 or size < best_size:
+            best, best_dom, best_size = k, dom, size
+    return best, best_dom, [k for k in remaining if k != best]
+
+
+def search_forward_checking(course_bits, compat, on_leaf, limit, allowed=-1, remaining=None, chosen=(), budget=None,
+                            day_limit=None, days=0):
+    """
+    Compatibility-bitset search with forward checking and dynamic
+    minimum-remaining-values ordering. After each placement the remaining
+    courses' domains are narrowed to the sections compatible with it; a
+    branch is abandoned as soon as any domain becomes empty, and the next
+    course is the one with the fewest remaining sections.
+
+    on_leaf receives the chosen flat indices sorted ascending, i.e. in
+    course order regardless of the order they were placed in, and returns
+    how many schedules it emitted for them (more than one when the indices
+    stand for equivalence classes, see collapse_equivalent). A DayLimit
+    narrows the remaining domains by the campus days used as well.
+
+    allowed/remaining/chosen (and the days they use) start the search below
+    an existing partial schedule.
+    """
+    found = 0
+    chosen = list(chosen)
+
+    def bt(allowed, remaining, days):
+        nonlocal found
+        if budget:
+            budget.tick()
+        picked = _pick_mrv(course_bits, allowed, remaining)
+        if picked is None:
+            return
+        _, cand, rest = picked
+        while cand and found < limit:
+            low = cand & -cand
+            cand ^= low
+            i = low.bit_length() - 1
+            if not rest:
+                found += on_leaf(tuple(sorted(chosen + [i])))
+                continue
+            sub_days, sub = days, allowed & compat[i]
+            if day_limit:
+                sub_days, sub = day_limit.narrow(days, i, sub)
+            chosen.append(i)
+            bt(sub, rest, sub_days)
+            chosen.pop()
+
+    if remaining is None:
+        remaining = list(range(len(course_bits)))
+    if not remaining:
+        return on_leaf(tuple(sorted(chosen)))
+    if day_limit:
+        allowed &= day_limit.fits(days)
+    if limit > 0:
+        bt(allowed, remaining, days)
+    return found
+
+
+def iter_forward_checking(course_bits, compat, resume=None, allowed=-1, remaining=None, chosen=(), budget=None,
+                          day_limit=None, days=0):
+    """
+    Lazy form of search_forward_checking (same day_limit/days arguments):
+    yields (indices, path) for every leaf, in the same order. path[d] is the position of the section chosen
+    at depth d among that depth's candidates; since the search order is
+    deterministic it is a JSON-serializable position in the search tree.
+    Passing a yielded path as `resume` restarts the search at that leaf.
+    """
+    if remaining is None:
+        remaining = list(range(len(course_bits)))
+    if not remaining:
+        yield tuple(sorted(chosen)), []
+        return
+    if budget:
+        budget.tick()
+    if day_limit and not chosen:
+        allowed &= day_limit.fits(days)
+    picked = _pick_mrv(course_bits, allowed, remaining)
+    if picked is None:
+        return
+    _, dom, rest = picked
+    cands = list(iter_bits(dom))
+    start = resume[0] if resume else 0
+    for pos in range(start, len(cands)):
+        i = cands[pos]
+        sub_days, sub_allowed = days, allowed & compat[i]
+        if day_limit:
+            sub_days, sub_allowed = day_limit.narrow(days, i, sub_allowed)
+        sub = resume[1:] if resume and pos == start else None
+        for indices, path in iter_forward_checking(course_bits, compat, sub, sub_allowed, rest, chosen + (i,), budget,
+                                                   day_limit, sub_days):
+            yield indices, [pos] + path
+
+
+def leaf_weight(indices, weights):
+    """Concrete schedules behind a leaf (product of class sizes; 1 without weights)."""
+    return math.prod(weights[i] for i in indices) if weights else 1
+
+
+def _bits_weight(bits, weights):
+    if not weights:
+        return bits.bit_count()
+    return sum(weights[i] for i in iter_bits(bits))
+
+
+def count_forward_checking(course_bits, compat, weights=None, cap=None, day_limit=None):
+    """
+    Number of valid schedules, without building any of them: the
+    forward-checking search with the last two levels counted directly
+    (sum over the next-to-last course's candidates of the weight of their
+    compatible last-course candidates). weights as for leaf_weight; a
+    DayLimit narrows the candidates as in the searches. Stops early once
+    the count reaches `cap`, returning a value >= cap.
+    """
+    total = 0
+
+    def count(allowed, remaining, factor, days):
+        nonlocal total
+        picked = _pick_mrv(course_bits, allowed, remaining)
+        if picked is None:
+            return
+        _, cand, rest = picked
+        if not rest:
+            total += factor * _bits_weight(cand, weights)
+            return
+        last = rest[0] if len(rest) == 1 else None
+        for i in iter_bits(cand):
+            w = factor * (weights[i] if weights else 1)
+            sub_days, sub = days, allowed & compat[i]
+            if day_limit:
+                sub_days, sub = day_limit.narrow(days, i, sub)
+            if last is not None:
+                total += w * _bits_weight(course_bits[last] & sub, weights)
+            else:
+                count(sub, rest, w, sub_days)
+            if cap is not None and total >= cap:
+                return
+
+    if not course_bits:
+        return 1
+    count(day_limit.fits(0) if day_limit else -1, list(range(len(course_bits))), 1, 0)
+    return total
+
+
+# ─── Parallel search ────────────────────────────────────────────────
+
+_pool = None
+_pool_workers = 0
+_manager = None
+
+
+def get_pool(workers):
+    """Process pool kept warm across invocations on the same worker (shared by every solver caller)."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def _get_manager():
+    """Manager process kept warm next to the pool; serves the per-search stop events of pool tasks."""
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.Manager()
+    return _manager
+
+
+def _subtree_leaves(course_bits, compat, root, first, resume, budget=None, day_limit=None):
+    remaining = [k for k in range(len(course_bits)) if k != root]
+    days, allowed = 0, compat[first]
+    if day_limit:
+        days, allowed = day_limit.narrow(0, first, allowed & day_limit.fits(0))
+    return iter_forward_checking(course_bits, compat, resume, allowed, remaining, (first,), budget, day_limit, days)
+
+
+def _solve_subtree(course_bits, compat, weights, root, first, resume, limit, day_limit=None,
+                   deadline=None, nodes=None, stop=None):
+    """
+    Pool task: the leaves below placing section `first` of course `root`,
+    stopping once they stand for `limit` schedules. The task runs under its
+    own SearchBudget: `deadline` (a time.time() value), a `nodes` allowance
+    and the `stop` event of its search as the cancellation check. Returns
+    (leaves, truncated, reason), reason being the BudgetExceeded reason
+    that ended the task early, else None.
+    """
+    budget = SearchBudget(
+        seconds=max(deadline - time.time(), 1e-6) if deadline is not None else None,
+        nodes=max(nodes, 1) if nodes is not None else None,
+        cancelled=stop.is_set if stop is not None else None,
+    )
+    leaves = []
+    total = 0
+    try:
+        for leaf in _subtree_leaves(course_bits, compat, root, first, resume, budget, day_limit):
+            leaves.append(leaf)
+            total += leaf_weight(leaf[0], weights)
+            if total >= limit:
+                return leaves, True, None
+    except BudgetExceeded as e:
+        return leaves, False, e.reason
+    return leaves, False, None
+
+
+def iter_parallel(course_bits, compat, workers, limit, weights=None, resume=None, budget=None, day_limit=None):
+    """
+    iter_forward_checking split on the sections of the most constrained
+    course, the same course the sequential search branches on first. Each
+    subtree runs as a task in a process pool; leaves are yielded subtree by
+    subtree in section order as soon as every earlier subtree has finished,
+    so output order and paths match the sequential search and streaming
+    continues while later subtrees are still running.
+
+    Each task stops after `limit` schedules (weights[i] is the number of
+    concrete schedules index i stands for); should the consumer want more
+    from a truncated subtree, the rest of it is searched in-process.
+    A budget is checked while waiting on tasks and ticked by the in-process
+    search. Each task gets what is left of its time and node budget when
+    submitted, and polls a stop event that is set as soon as this generator
+    ends (exhausted, closed by the consumer, out of budget or cancelled),
+    so running tasks stop with it instead of occupying the warm pool. A
+    task that runs out of budget ends the search with its reason after its
+    leaves are yielded.
+    """
+    if not course_bits:
+        yield from iter_forward_checking(course_bits, compat, resume, budget=budget)
+        return
+    picked = _pick_mrv(course_bits, day_limit.fits(0) if day_limit else -1, list(range(len(course_bits))))
+    if picked is None:
+        return
+    root, dom, _ = picked
+    cands = list(iter_bits(dom))
+    start = resume[0] if resume else 0
+    pool = get_pool(workers)
+    stop = _get_manager().Event()
+    seconds, nodes = budget.remaining() if budget else (None, None)
+    deadline = time.time() + seconds if seconds is not None else None
+    futures = [
+        (pos, pool.submit(_solve_subtree, course_bits, compat, weights, root, cands[pos],
+                          resume[1:] if resume and pos == start else None, limit, day_limit,
+                          deadline, nodes, stop))
+        for pos in range(start, len(cands))
+    ]
+    try:
+        for pos, fut in futures:
+            while True:
+                try:
+                    leaves, truncated, reason = fut.result(timeout=0.25 if budget else None)
+                    break
+                except FutureTimeout:
+                    budget.check()
+            for indices, path in leaves:
+                yield indices, [pos] + path
+            if reason is not None:
+                if budget:
+                    budget.reason = reason
+                raise BudgetExceeded(reason)
+            if truncated:
+                rest = _subtree_leaves(course_bits, compat, root, cands[pos], leaves[-1][1], budget, day_limit)
+                next(rest)  # the last leaf the task returned
+                for indices, path in rest:
+                    yield indices, [pos] + path
+    finally:
+        stop.set()
+        for _, fut in futures:
+            fut.cancel()
+
+
+def collapse_equivalent(groups):
+    """
+    Groups each course's sections into timetable-equivalence classes
+    (identical occupancy masks, differing only by section number, faculty
+    or room). groups holds one list of masks per course.
+
+    Returns (class_groups, members): class_groups[k] lists course k's
+    distinct masks in first-seen order and members[k][c] the positions in
+    groups[k] of the sections sharing class c.
+    """
+    class_groups, members = [], []
+    for group in groups:
+        seen = {}
+        masks, positions = [], []
+        for pos, mask in enumerate(group):
+            c = seen.get(mask)
+            if c is None:
+                c = seen[mask] = len(masks)
+                masks.append(mask)
+                positions.append([])
+            positions[c].append(pos)
+        class_groups.append(masks)
+        members.append(positions)
+    return class_groups, members
+
+
+# ─── Ranked (top-K) generation ──────────────────────────────────────
+
+DEFAULT_WEIGHTS = {"campus_days": 1.0, "gaps": 0.5, "early_start": 1.0, "preferred_faculty": 1.0}
+
+
+def compile_preferences(prefs):
+    """
+    Normalizes the `preferences` request object:
+      {
+        "weights": {"campus_days": 1, "gaps": 0.5, "early_start": 1, "preferred_faculty": 1},
+        "early_start_before": "10:00 AM",
+        "preferred_faculty": ["MAR", ...]
+      }
+    Weights are penalties: per campus day, per idle hour between classes,
+    per weekly class starting before the cutoff and per section not taught
+    by a preferred faculty member. They must be finite and non-negative:
+    search_ranked's branch-and-bound cut assumes no term can lower the cost.
+    """
+    prefs = prefs or {}
+    weights = dict(DEFAULT_WEIGHTS)
+    for key, val in (prefs.get("weights") or {}).items():
+        if key in weights:
+            weight = float(val)
+            if not math.isfinite(weight) or weight < 0:
+                raise ValueError(f"Invalid preference weight for {key}: {val}")
+            weights[key] = weight
+    return {
+        "weights": weights,
+        "early_cutoff": parse_time_to_minutes(prefs.get("early_start_before") or "10:00 AM"),
+        "preferred_faculty": {f.strip().upper() for f in prefs.get("preferred_faculty") or [] if f},
+    }
+
+
+def section_penalty(model, prefs):
+    """Per-section part of the schedule cost (early starts and faculty) of a SectionModel."""
+    weights = prefs["weights"]
+    penalty = 0.0
+    cutoff = prefs["early_cutoff"]
+    if cutoff is not None and weights["early_start"]:
+        for start, _, days in model.timings:
+            if start is not None and start < cutoff:
+                penalty += weights["early_start"] * days.bit_count()
+    preferred = prefs["preferred_faculty"]
+    if preferred and (model.row.get("faculty") or "").strip().upper() not in preferred:
+        penalty += weights["preferred_faculty"]
+    return penalty
+
+
+def schedule_cost(occupied, penalty, prefs, days=None):
+    """Cost of a schedule with this occupancy mask; `days` is occupied_days(occupied) when already known."""
+    weights = prefs["weights"]
+    if days is None:
+        days = occupied_days(occupied)
+    return (
+        weights["campus_days"] * days.bit_count()
+        + weights["gaps"] * idle_minutes(occupied, days) / 60
+        + penalty
+    )
+
+
+def search_ranked(course_bits, compat, masks, penalties, prefs, k, budget=None, day_limit=None, day_masks=None):
+    """
+    Branch-and-bound over the forward-checking search that keeps the k
+    cheapest schedules in a bounded heap. A branch is cut when its lower
+    bound (campus days so far, penalties so far and each remaining course's
+    cheapest section penalty) cannot beat the worst schedule kept. Cheaper
+    sections are tried first so good schedules, and tight bounds, come early.
+
+    A DayLimit narrows the candidates as in the other searches. The days
+    used so far are tracked from day_masks (occupied_days of each mask,
+    taken from the DayLimit or computed here) rather than read back from
+    the occupancy mask at every node.
+
+    Returns [(cost, indices)] sorted by cost, ties in discovery order.
+    When the budget runs out the best schedules found so far are returned
+    (budget.reason says why the search stopped).
+    """
+    if k <= 0:
+        return []
+    if not course_bits:
+        return [(0.0, ())]
+    w_days = prefs["weights"]["campus_days"]
+    if day_masks is None:
+        day_masks = day_limit.day_masks if day_limit else [occupied_days(m) for m in masks]
+    min_penalty = [min(penalties[i] for i in iter_bits(bits)) for bits in course_bits]
+    heap = []  # (-cost, -seq, indices): the root is the worst schedule kept
+    seq = 0
+    chosen = []
+
+    def bt(allowed, remaining, occupied, penalty, days):
+        nonlocal seq
+        if budget:
+            budget.tick()
+        if len(heap) >= k:
+            bound = w_days * days.bit_count() + penalty + sum(min_penalty[c] for c in remaining)
+            if bound >= -heap[0][0]:
+                return
+        picked = _pick_mrv(course_bits, allowed, remaining)
+        if picked is None:
+            return
+        _, best_dom, rest = picked
+        for i in sorted(iter_bits(best_dom), key=penalties.__getitem__):
+            occ = occupied | masks[i]
+            pen = penalty + penalties[i]
+            if rest:
+                sub = allowed & compat[i]
+                if day_limit:
+                    sub_days, sub = day_limit.narrow(days, i, sub)
+                else:
+                    sub_days = days | day_masks[i]
+                chosen.append(i)
+                bt(sub, rest, occ, pen, sub_days)
+                chosen.pop()
+                continue
+            cost = schedule_cost(occ, pen, prefs, days | day_masks[i])
+            seq += 1
+            if len(heap) < k:
+                heapq.heappush(heap, (-cost, -seq, tuple(sorted(chosen + [i]))))
+            elif cost < -heap[0][0]:
+                heapq.heapreplace(heap, (-cost, -seq, tuple(sorted(chosen + [i]))))
+
+    try:
+        bt(day_limit.fits(0) if day_limit else -1, list(range(len(course_bits))), 0, 0.0, 0)
+    except BudgetExceeded:
+        pass  # anytime: keep the best found so far
+    return [(-neg_cost, indices) for neg_cost, _, indices in sorted(heap, key=lambda e: (-e[0], -e[1]))]
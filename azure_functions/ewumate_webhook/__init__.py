@@ -23,7 +23,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     │ examschedule/       │ Exam Schedule Spring ...     │ handle_parse_exam (TBD) │
     │ advisingschedule/   │ Advising Schedule Spring ... │ handle_parse_advising   │
     └─────────────────────┴──────────────────────────────┴─────────────────────────┘
-    Both INSERT (new file) and UPDATE (re-upload same name) events are handled.
+    Both INSERT (new file) and UPDATE (re-upload same name) events are handled;
+    a byte-identical re-upload returns the previous summary ("cached": true).
     """
     logging.info("Supabase storage webhook triggered.")
 
@@ -0,0 +1,39 @@
+-- ==========================================
+-- EWUMATE SCHEMA MIGRATION: Append-only schedule generation batches
+-- ==========================================
+
+-- In "append" stream mode the generator writes each batch of new
+-- combinations as its own row here instead of rewriting
+-- schedule_generations.combinations; the parent row only carries status/count.
+ALTER TABLE public.schedule_generations ADD COLUMN IF NOT EXISTS stream_mode TEXT DEFAULT 'full';
+
+CREATE TABLE IF NOT EXISTS public.schedule_generation_batches (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    generation_id UUID NOT NULL REFERENCES public.schedule_generations(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    combinations JSONB DEFAULT '[]'::jsonb,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (generation_id, seq)
+);
+
+ALTER TABLE public.schedule_generation_batches ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own generation batches" ON public.schedule_generation_batches;
+CREATE POLICY "Users can view own generation batches"
+    ON public.schedule_generation_batches FOR SELECT TO authenticated
+    USING (EXISTS (
+        SELECT 1 FROM public.schedule_generations g
+        WHERE g.id = generation_id AND g.user_id = auth.uid()
+    ));
+
+-- Enable Supabase Realtime for batches (Safely)
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_publication_tables
+        WHERE pubname = 'supabase_realtime' AND tablename = 'schedule_generation_batches'
+    ) THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE schedule_generation_batches;
+    END IF;
+END
+$$;
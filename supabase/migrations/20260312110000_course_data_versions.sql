@@ -0,0 +1,17 @@
+-- ==========================================
+-- EWUMATE SCHEMA MIGRATION: Course data versions
+-- ==========================================
+
+-- One row per dynamic course table (courses_<semester>). parse_faculty
+-- bumps the version whenever it reloads the table; schedule generation
+-- uses it to invalidate cached results across function workers.
+CREATE TABLE IF NOT EXISTS public.course_data_versions (
+    table_name TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE public.course_data_versions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow public read of course_data_versions" ON public.course_data_versions;
+CREATE POLICY "Allow public read of course_data_versions" ON public.course_data_versions FOR SELECT TO authenticated USING (true);
@@ -0,0 +1,8 @@
+-- ==========================================
+-- EWUMATE SCHEMA MIGRATION: Resumable schedule generations
+-- ==========================================
+
+-- Search position after the last stored schedule plus the course data
+-- version it was taken against. next_schedules_page resumes from here;
+-- NULL means the search space is exhausted (or the run was ranked).
+ALTER TABLE public.schedule_generations ADD COLUMN IF NOT EXISTS cursor JSONB;
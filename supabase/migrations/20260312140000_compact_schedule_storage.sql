@@ -0,0 +1,10 @@
+-- ==========================================
+-- EWUMATE SCHEMA MIGRATION: Compact schedule combination storage
+-- ==========================================
+
+-- With storage_format 'compact' each combination holds section doc_ids
+-- only; the sections themselves are stored once per generation in
+-- `sections` (doc_id -> section), or per batch in append stream mode.
+ALTER TABLE public.schedule_generations ADD COLUMN IF NOT EXISTS storage_format TEXT DEFAULT 'full';
+ALTER TABLE public.schedule_generations ADD COLUMN IF NOT EXISTS sections JSONB DEFAULT '{}'::jsonb;
+ALTER TABLE public.schedule_generation_batches ADD COLUMN IF NOT EXISTS sections JSONB DEFAULT '{}'::jsonb;
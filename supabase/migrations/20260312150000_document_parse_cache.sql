@@ -0,0 +1,19 @@
+-- ==========================================
+-- EWUMATE SCHEMA MIGRATION: Parse cache for uploaded documents
+-- ==========================================
+
+-- Last successful parse per storage folder and semester: SHA-256 of the
+-- uploaded file, the parser version that read it and the summary it
+-- returned. The parse functions skip byte-identical re-uploads.
+-- Written by the service role only.
+CREATE TABLE IF NOT EXISTS public.document_parse_cache (
+    folder TEXT NOT NULL,
+    semester_code TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    parser_version TEXT NOT NULL,
+    summary JSONB,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (folder, semester_code)
+);
+
+ALTER TABLE public.document_parse_cache ENABLE ROW LEVEL SECURITY;